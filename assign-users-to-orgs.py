@@ -13,11 +13,13 @@ z = zendesk.ZendeskClient(
     os.getenv("ZENDESK_PASSWORD"),
 )
 
+desired = {}
 with open("zendesk-people.csv", newline="") as f:
-    reader = csv.DictReader(f)
-    for row in reader:
+    rows = list(csv.DictReader(f))
+    users = z.get_users_by_ids(int(row.get("user_id")) for row in rows)
+    for row in rows:
         user_id = int(row.get("user_id"))
-        user = z.get_user_by_id(user_id)
+        user = users.get(user_id)
 
         new_orgs_str = row.get("new_organizations")
         if new_orgs_str:
@@ -32,16 +34,25 @@ with open("zendesk-people.csv", newline="") as f:
         else:
             old_orgs_set = set()
 
-        orgs_to_add = new_orgs_set - old_orgs_set
-        orgs_to_del = old_orgs_set - new_orgs_set
-
         log.info(f"Processing org changes for {user.email}")
 
-        for org_name in orgs_to_add:
-            org = z.get_organization_by_name(org_name)
-            log.info(f"** Adding {user.email} to {org_name}")
-            user.add_org_membership(org)
-        for org_name in orgs_to_del:
+        # only touch the organizations that changed between the two columns
+        org_ids = {m.organization_id for m in z.list_org_memberships_for_user(user_id)}
+        for org_name in old_orgs_set - new_orgs_set:
             org = z.get_organization_by_name(org_name)
             log.info(f"** Removing {user.email} from {org_name}")
-            user.unassign_organization(org)
+            org_ids.discard(org.id)
+        for org_name in new_orgs_set - old_orgs_set:
+            org = z.get_organization_by_name(org_name)
+            log.info(f"** Adding {user.email} to {org_name}")
+            org_ids.add(org.id)
+        desired[user_id] = org_ids
+
+try:
+    jobs = z.sync_organization_memberships(desired)
+except zendesk.ZendeskJobsError as e:
+    log.error(e)
+    jobs = e.jobs
+for job in z.wait_for_jobs(jobs):
+    for r in job.failures:
+        log.error(f"{r.get('id')}: {r.get('error')} {r.get('details')}")
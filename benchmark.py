@@ -0,0 +1,98 @@
+import argparse
+import csv
+import fake_zendesk
+import logging
+import os
+import pathlib
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+log = logging.getLogger(__name__)
+
+SCRIPTS = ("get-people.py", "solve-old-tickets.py", "update-user-external-id.py")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", default=10000, type=int)
+    parser.add_argument("--tickets", type=int)
+    parser.add_argument("--rate-per-minute", default=100000, type=int)
+    parser.add_argument("scripts", nargs="*", default=SCRIPTS)
+    return parser.parse_args()
+
+
+def write_external_ids(fake: fake_zendesk.FakeZendesk, path: pathlib.Path):
+    with path.open("w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["email", "external_id"])
+        for i in range(0, fake.n_users, 3):
+            writer.writerow([f"user{i}@example.com", f"E{i:07d}"])
+
+
+def run_script(script: str, env: dict, fake: fake_zendesk.FakeZendesk) -> dict:
+    with fake.lock:
+        fake.request_count = 0
+    start = time.monotonic()
+    p = subprocess.Popen(
+        [sys.executable, script],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    _, status, rusage = os.wait4(p.pid, 0)
+    p.returncode = os.waitstatus_to_exitcode(status)
+    return {
+        "script": script,
+        "returncode": p.returncode,
+        "seconds": time.monotonic() - start,
+        "requests": fake.request_count,
+        # ru_maxrss is in kilobytes on Linux
+        "peak_mb": rusage.ru_maxrss / 1024,
+    }
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(message)s")
+    args = parse_args()
+    fake = fake_zendesk.FakeZendesk(
+        args.users, args.tickets, rate_per_minute=args.rate_per_minute
+    )
+    server = fake_zendesk.make_server(fake)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    log.info(
+        f"Fake Zendesk with {fake.n_users} users and {fake.n_tickets} tickets "
+        f"on port {server.server_port}"
+    )
+
+    with tempfile.TemporaryDirectory() as tmp:
+        external_id_file = pathlib.Path(tmp) / "external-ids.csv"
+        write_external_ids(fake, external_id_file)
+        results = []
+        for script in args.scripts:
+            env = dict(
+                os.environ,
+                EXTERNAL_ID_FILE=str(external_id_file),
+                LOG_LEVEL="WARNING",
+                ZENDESK_COMPANY=f"http://127.0.0.1:{server.server_port}",
+                ZENDESK_PASSWORD="password",
+                ZENDESK_USERNAME="benchmark@example.com",
+            )
+            result = run_script(script, env, fake)
+            log.info(
+                f"{result['script']}: {result['seconds']:.1f}s, "
+                f"{result['requests']} requests, {result['peak_mb']:.0f} MB peak, "
+                f"exit {result['returncode']}"
+            )
+            results.append(result)
+    server.shutdown()
+
+    writer = csv.DictWriter(sys.stdout, fieldnames=list(results[0]))
+    writer.writeheader()
+    writer.writerows(results)
+
+
+if __name__ == "__main__":
+    main()
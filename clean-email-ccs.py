@@ -17,10 +17,9 @@ def parse_args():
 def main():
     args = parse_args()
     s = settings.Settings()
-    z = zendesk.ZendeskClient(s.zendesk_company, s.zendesk_username, s.zendesk_password)
-    query = f"type:ticket status<solved cc:{args.email}"
-    data = z.search(query)
-    for result in data.get("results", []):
+    z = zendesk.ZendeskClient.from_settings(s)
+    query = f"status<solved cc:{args.email}"
+    for result in z.search_export(query, "ticket"):
         ticket_id = result.get("id")
         log.info(f"Found a ticket: {ticket_id}")
         go = input(f"Do you want to remove {args.email} from the ticket email_ccs? ")
@@ -1,5 +1,6 @@
 import argparse
 import csv
+import reconcile
 import sys
 
 
@@ -7,19 +8,34 @@ def parse_args():
     parser = argparse.ArgumentParser()
     parser.add_argument("-z", "--zendesk-file")
     parser.add_argument("-w", "--workday-file")
+    parser.add_argument(
+        "--diff",
+        action="store_true",
+        help="write a reconciliation of both files instead of the in_workday report",
+    )
+    parser.add_argument("--zendesk-id-column", default="External ID")
+    parser.add_argument("--workday-id-column", default="Employee ID")
+    parser.add_argument(
+        "--compare",
+        action="append",
+        default=[],
+        help="compare a zendesk column to a workday column, as ZENDESK=WORKDAY",
+    )
+    parser.add_argument(
+        "--all", action="store_true", help="also write users that match"
+    )
     return parser.parse_args()
 
 
-def main():
-    args = parse_args()
+def in_workday_report(args):
     csv_out = csv.writer(sys.stdout)
     csv_out.writerow(["email", "org", "in_workday"])
     with open(args.workday_file) as workday_file:
         workday_reader = csv.DictReader(workday_file)
-        workday_users = []
+        workday_users = set()
         for row in workday_reader:
             email = row["Email Address"].split(" ")[0].lower()
-            workday_users.append(email)
+            workday_users.add(email)
     with open(args.zendesk_file) as zendesk_file:
         zendesk_reader = csv.DictReader(zendesk_file)
         for row in zendesk_reader:
@@ -32,5 +48,60 @@ def main():
             )
 
 
+def diff_report(args):
+    def zendesk_key(row: dict) -> tuple[str, str]:
+        return (
+            reconcile.normalize_email(row.get("Email")),
+            reconcile.normalize_id(row.get(args.zendesk_id_column)),
+        )
+
+    def workday_key(row: dict) -> tuple[str, str]:
+        return (
+            reconcile.normalize_email(row.get("Email Address")),
+            reconcile.normalize_id(row.get(args.workday_id_column)),
+        )
+
+    compare = {}
+    for pair in args.compare:
+        zendesk_column, _, workday_column = pair.partition("=")
+        compare[zendesk_column] = (zendesk_column, workday_column or zendesk_column)
+
+    diffs = reconcile.reconcile(
+        reconcile.iter_csv(args.zendesk_file),
+        reconcile.iter_csv(args.workday_file),
+        zendesk_key,
+        workday_key,
+        compare=compare,
+        build=reconcile.smaller_side(args.zendesk_file, args.workday_file),
+        include_matches=args.all,
+    )
+
+    csv_out = csv.writer(sys.stdout)
+    csv_out.writerow(
+        ["status", "email", "org", "in_workday", "workday_email", "differences"]
+    )
+    for diff in diffs:
+        zendesk_row = diff.left or {}
+        workday_row = diff.right or {}
+        csv_out.writerow(
+            [
+                diff.status,
+                zendesk_row.get("Email"),
+                zendesk_row.get("Organization"),
+                str(diff.right is not None),
+                workday_row.get("Email Address"),
+                " ".join(diff.fields),
+            ]
+        )
+
+
+def main():
+    args = parse_args()
+    if args.diff:
+        diff_report(args)
+    else:
+        in_workday_report(args)
+
+
 if __name__ == "__main__":
     main()
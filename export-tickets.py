@@ -0,0 +1,181 @@
+import argparse
+import concurrent.futures
+import datetime
+import json
+import logging
+import os
+import pathlib
+import settings
+import shutil
+import sys
+import time
+import zendesk
+
+log = logging.getLogger("zendesk_api.export_tickets")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("output_file", type=pathlib.Path)
+    parser.add_argument(
+        "--start-time",
+        default=0,
+        type=int,
+        help="unix time to start from, defaults to the first ticket update",
+    )
+    parser.add_argument(
+        "--end-time", type=int, help="unix time to stop at, defaults to now"
+    )
+    parser.add_argument("--workers", default=os.cpu_count(), type=int)
+    parser.add_argument(
+        "--shards",
+        type=int,
+        help="time windows to split into, defaults to 4 per worker",
+    )
+    return parser.parse_args()
+
+
+def setup_logging(s: settings.Settings):
+    logging.basicConfig(format=s.log_format, level=logging.DEBUG, stream=sys.stdout)
+    if not s.log_level == "DEBUG":
+        log.debug(f"Changing log level to {s.log_level}")
+    logging.getLogger().setLevel(s.log_level)
+
+
+def updated_at(ticket: dict) -> float:
+    return datetime.datetime.fromisoformat(ticket.get("updated_at")).timestamp()
+
+
+def first_update(z: zendesk.ZendeskClient, start_time: int) -> int | None:
+    # the first ticket update at or after start_time; windows start there
+    # rather than at the epoch, which would leave all but the last shards empty
+    ticket = next(z.get_incremental_tickets(start_time, per_page=1), None)
+    return None if ticket is None else int(updated_at(ticket))
+
+
+def windows(start_time: int, end_time: int, shards: int) -> list[tuple[int, int]]:
+    step = max(1, -(-(end_time - start_time) // shards))
+    return [(t, min(t + step, end_time)) for t in range(start_time, end_time, step)]
+
+
+def plan(
+    work_dir: pathlib.Path, z: zendesk.ZendeskClient, args
+) -> list[tuple[int, int]]:
+    # the windows are saved with the shards, so a re-run after a failure
+    # resumes the same shards instead of splitting a new time range
+    path = work_dir / "windows.json"
+    if path.exists():
+        log.info(f"Resuming the export planned in {path}")
+        return [tuple(w) for w in json.loads(path.read_text())]
+    end_time = args.end_time or int(time.time())
+    start_time = first_update(z, args.start_time)
+    if start_time is None or start_time >= end_time:
+        shard_windows = []
+    else:
+        shard_windows = windows(start_time, end_time, args.shards or 4 * args.workers)
+    path.write_text(json.dumps(shard_windows))
+    return shard_windows
+
+
+def export_shard(
+    work_dir: pathlib.Path, n: int, start_time: int, end_time: int, workers: int
+):
+    # each shard runs in its own process with its own session; tickets updated
+    # in [start_time, end_time) are written to shard-N.jsonl, and the export
+    # cursor is checkpointed so an interrupted shard resumes where it stopped
+    s = settings.Settings()
+    setup_logging(s)
+    part = work_dir / f"shard-{n:04d}.jsonl.part"
+    checkpoint = work_dir / f"shard-{n:04d}.cursor"
+    # the workers share the account rate limit
+    rate_limiter = zendesk.RateLimiter(share=1 / workers)
+    z = zendesk.ZendeskClient.from_settings(s, rate_limiter=rate_limiter)
+    count = 0
+    with part.open("a", buffering=1) as f:
+        for ticket in z.get_incremental_tickets(start_time, checkpoint):
+            if updated_at(ticket) >= end_time:
+                break
+            f.write(json.dumps(dict(ticket)) + "\n")
+            count += 1
+    part.replace(work_dir / f"shard-{n:04d}.jsonl")
+    checkpoint.unlink(missing_ok=True)
+    log.info(f"Shard {n} wrote {count} tickets updated before {end_time}")
+    return count
+
+
+def merge(shard_files: list[pathlib.Path], output_file: pathlib.Path) -> int:
+    # tickets that changed while the export ran show up in more than one
+    # shard; the first pass finds the latest version of each ticket, the
+    # second writes only that version, so memory holds one entry per ticket
+    latest = {}
+    for path in shard_files:
+        with path.open() as f:
+            for line in f:
+                ticket = json.loads(line)
+                ticket_id = ticket.get("id")
+                latest[ticket_id] = max(
+                    latest.get(ticket_id, ""), ticket.get("updated_at")
+                )
+    count = 0
+    tmp = output_file.with_name(f"{output_file.name}.tmp")
+    with tmp.open("w") as out:
+        for path in shard_files:
+            with path.open() as f:
+                for line in f:
+                    ticket = json.loads(line)
+                    ticket_id = ticket.get("id")
+                    if latest.get(ticket_id) == ticket.get("updated_at"):
+                        out.write(line)
+                        del latest[ticket_id]
+                        count += 1
+    tmp.replace(output_file)
+    return count
+
+
+def main():
+    s = settings.Settings()
+    setup_logging(s)
+    args = parse_args()
+
+    work_dir = args.output_file.with_name(f"{args.output_file.name}.shards")
+    work_dir.mkdir(parents=True, exist_ok=True)
+    shard_windows = plan(work_dir, zendesk.ZendeskClient.from_settings(s), args)
+
+    futures = {}
+    with concurrent.futures.ProcessPoolExecutor(args.workers) as executor:
+        for n, (start, end) in enumerate(shard_windows):
+            if (work_dir / f"shard-{n:04d}.jsonl").exists():
+                log.info(f"Shard {n} is already complete")
+                continue
+            future = executor.submit(
+                export_shard, work_dir, n, start, end, args.workers
+            )
+            futures[future] = n
+        total = 0
+        failed = []
+        for future in concurrent.futures.as_completed(futures):
+            n = futures[future]
+            try:
+                total += future.result()
+            except Exception as e:
+                start, end = shard_windows[n]
+                log.error(f"Shard {n} ({start} to {end}) failed: {e}")
+                failed.append(n)
+    log.info(f"Exported {total} tickets in {len(futures) - len(failed)} shards")
+
+    shard_files = sorted(work_dir.glob("shard-*.jsonl"))
+    count = merge(shard_files, args.output_file)
+    log.info(
+        f"Merged {len(shard_files)} shards into {count} tickets in {args.output_file}"
+    )
+    if failed:
+        log.error(
+            f"{len(failed)} shards failed, {args.output_file} is incomplete; "
+            "run the export again to resume them"
+        )
+        sys.exit(1)
+    shutil.rmtree(work_dir)
+
+
+if __name__ == "__main__":
+    main()
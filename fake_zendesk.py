@@ -0,0 +1,625 @@
+import argparse
+import bisect
+import datetime
+import hashlib
+import http.server
+import itertools
+import json
+import logging
+import math
+import re
+import threading
+import time
+import urllib.parse
+
+log = logging.getLogger(__name__)
+
+BASE_TIME = int(datetime.datetime(2020, 1, 1, tzinfo=datetime.UTC).timestamp())
+STATUSES = ("new", "open", "pending", "hold", "solved")
+
+
+def _iso(ts: int) -> str:
+    return datetime.datetime.fromtimestamp(ts, datetime.UTC).strftime(
+        "%Y-%m-%dT%H:%M:%SZ"
+    )
+
+
+class FakeZendesk:
+    # synthetic Zendesk data; every record is computed from its index so
+    # that large instances cost no memory until records are modified
+    def __init__(
+        self,
+        users: int = 10000,
+        tickets: int = None,
+        groups: int = 20,
+        rate_per_minute: int = 100000,
+        job_polls: int = 0,
+        max_jobs: int = 30,
+    ):
+        self.n_users = users
+        self.n_tickets = users if tickets is None else tickets
+        self.n_groups = groups
+        self.n_orgs = max(1, users // 100)
+        self.n_agents = math.ceil(users / 50)
+        self.n_extra_org_memberships = math.ceil(users / 10)
+        self.overrides = {}
+        self.jobs = {}
+        self.job_ids = itertools.count(1)
+        # jobs stay queued for job_polls status reads; like the real API,
+        # more than max_jobs unfinished jobs are refused
+        self.job_polls = job_polls
+        self.max_jobs = max_jobs
+        self.queued_jobs = {}
+        self.max_queued_jobs = 0
+        self.lock = threading.Lock()
+        self.request_count = 0
+        self.rate_per_minute = rate_per_minute
+        self.tokens = float(rate_per_minute)
+        self.updated = time.monotonic()
+
+    def _apply(self, kind: str, record: dict) -> dict:
+        record.update(self.overrides.get((kind, record["id"]), {}))
+        return record
+
+    def update_record(self, kind: str, record_id: int, params: dict) -> dict:
+        with self.lock:
+            self.overrides.setdefault((kind, record_id), {}).update(params)
+        return self.record(kind, record_id - 1)
+
+    # records
+
+    def group(self, i: int) -> dict:
+        return {"id": i + 1, "name": f"Group {i}", "default": i == 0, "deleted": False}
+
+    def group_membership(self, k: int) -> dict:
+        return {"id": k + 1, "user_id": k * 50 + 1, "group_id": k % self.n_groups + 1}
+
+    def organization(self, j: int) -> dict:
+        ts = BASE_TIME + j
+        return self._apply(
+            "organizations",
+            {
+                "id": j + 1,
+                "name": f"Org {j}",
+                "tags": [f"tag{j % 10}"],
+                "created_at": _iso(ts),
+                "updated_at": _iso(ts),
+                "deleted_at": None,
+            },
+        )
+
+    def organization_membership(self, k: int) -> dict:
+        if k < self.n_users:
+            user_index, org_index = k, k % self.n_orgs
+        else:
+            user_index = (k - self.n_users) * 10
+            org_index = (user_index * 7 + 1) % self.n_orgs
+        return {
+            "id": k + 1,
+            "user_id": user_index + 1,
+            "organization_id": org_index + 1,
+            "default": k < self.n_users,
+        }
+
+    def ticket(self, t: int) -> dict:
+        ts = BASE_TIME + t * 60
+        return self._apply(
+            "tickets",
+            {
+                "id": t + 1,
+                "subject": f"Ticket {t}",
+                "status": STATUSES[t % len(STATUSES)],
+                "requester_id": t % self.n_users + 1,
+                "external_id": None,
+                "custom_fields": [
+                    {"id": 360000398388, "value": None if t % 2 else "done"}
+                ],
+                "created_at": _iso(ts),
+                "updated_at": _iso(ts),
+            },
+        )
+
+    def user(self, i: int) -> dict:
+        ts = BASE_TIME + i
+        return self._apply(
+            "users",
+            {
+                "id": i + 1,
+                "name": f"User {i}",
+                "email": f"user{i}@example.com",
+                "external_id": None if i % 3 == 0 else f"E{i:07d}",
+                "role": "agent" if i % 50 == 0 else "end-user",
+                "active": True,
+                "verified": True,
+                "suspended": i % 97 == 0,
+                "restricted_agent": i % 100 == 0,
+                "ticket_restriction": "requested",
+                "organization_id": i % self.n_orgs + 1,
+                "shared": False,
+                "last_login_at": _iso(ts),
+                "created_at": _iso(ts),
+                "updated_at": _iso(ts),
+            },
+        )
+
+    def identity(self, i: int) -> dict:
+        user = self.user(i)
+        return {
+            "id": user["id"],
+            "user_id": user["id"],
+            "type": "email",
+            "value": user["email"],
+            "primary": True,
+        }
+
+    def record(self, kind: str, index: int) -> dict:
+        return getattr(self, self.collections[kind][0])(index)
+
+    def user_group_ids(self, i: int) -> list[int]:
+        # the inverse of group_membership
+        k, rest = divmod(i, 50)
+        if rest or k >= self.n_agents:
+            return []
+        return [self.group_membership(k)["group_id"]]
+
+    def user_organization_ids(self, i: int) -> list[int]:
+        # the inverse of organization_membership
+        ks = [i] if i < self.n_users else []
+        extra, rest = divmod(i, 10)
+        if not rest and extra < self.n_extra_org_memberships:
+            ks.append(self.n_users + extra)
+        return [self.organization_membership(k)["organization_id"] for k in ks]
+
+    @property
+    def collections(self) -> dict[str, tuple[str, int]]:
+        return {
+            "group_memberships": ("group_membership", self.n_agents),
+            "groups": ("group", self.n_groups),
+            "organization_memberships": (
+                "organization_membership",
+                self.n_users + self.n_extra_org_memberships,
+            ),
+            "organizations": ("organization", self.n_orgs),
+            "tickets": ("ticket", self.n_tickets),
+            "users": ("user", self.n_users),
+        }
+
+    # search
+
+    def search_index(self, query_text: str):
+        # tickets matching a search, as (count, nth) where nth(k) is the index
+        # of the k-th match; statuses repeat every len(STATUSES) tickets, so
+        # only tickets with overrides are looked at one by one
+        def matches(ticket: dict) -> bool:
+            return not ("status<solved" in query_text and ticket["status"] == "solved")
+
+        period = len(STATUSES)
+        pattern = [matches({"status": s}) for s in STATUSES]
+        with self.lock:
+            changed = [i - 1 for kind, i in self.overrides if kind == "tickets"]
+        removed = []
+        added = []
+        for t in changed:
+            if (
+                0 <= t < self.n_tickets
+                and matches(self.ticket(t)) != pattern[t % period]
+            ):
+                (removed if pattern[t % period] else added).append(t)
+        removed.sort()
+        added.sort()
+
+        def rank(t: int) -> int:
+            # matches among tickets [0, t)
+            base = (t // period) * sum(pattern) + sum(pattern[: t % period])
+            return base - bisect.bisect_left(removed, t) + bisect.bisect_left(added, t)
+
+        def nth(k: int) -> int:
+            lo, hi = 0, self.n_tickets - 1
+            while lo < hi:
+                mid = (lo + hi) // 2
+                if rank(mid + 1) > k:
+                    hi = mid
+                else:
+                    lo = mid + 1
+            return lo
+
+        return rank(self.n_tickets), nth
+
+    # rate limiting
+
+    def take_token(self) -> float:
+        # returns 0 when the request may proceed, otherwise seconds to wait
+        with self.lock:
+            self.request_count += 1
+            now = time.monotonic()
+            rate = self.rate_per_minute / 60
+            self.tokens = min(
+                self.rate_per_minute, self.tokens + (now - self.updated) * rate
+            )
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0.0
+            return (1 - self.tokens) / rate
+
+    # jobs
+
+    def job(self, results: list[dict]) -> dict:
+        job_id = f"job{next(self.job_ids)}"
+        job = {
+            "id": job_id,
+            "status": "completed",
+            "progress": len(results),
+            "total": len(results),
+            "results": results,
+        }
+        with self.lock:
+            self.jobs[job_id] = job
+            if self.job_polls > 0:
+                self.queued_jobs[job_id] = self.job_polls
+                self.max_queued_jobs = max(self.max_queued_jobs, len(self.queued_jobs))
+                job = {**job, "status": "queued", "progress": 0, "results": None}
+        return {"job_status": job}
+
+    def job_status(self, job_id: str) -> dict | None:
+        with self.lock:
+            job = self.jobs.get(job_id)
+            polls = self.queued_jobs.get(job_id)
+            if job is None or polls is None:
+                return job
+            if polls <= 1:
+                del self.queued_jobs[job_id]
+                return job
+            self.queued_jobs[job_id] = polls - 1
+        return {**job, "status": "queued", "progress": 0, "results": None}
+
+    def too_many_jobs(self) -> bool:
+        with self.lock:
+            return len(self.queued_jobs) >= self.max_jobs
+
+
+class Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    fake: FakeZendesk = None
+    routes = []
+
+    def log_message(self, format, *args):
+        log.debug(format % args)
+
+    def _send(self, status: int, body: dict = None, headers: dict = None):
+        data = b"" if body is None else json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.send_header("X-Rate-Limit", str(self.fake.rate_per_minute))
+        self.send_header("X-Rate-Limit-Remaining", str(int(self.fake.tokens)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_validated(self, body: dict):
+        # GET responses carry an ETag, and a matching If-None-Match gets an
+        # empty 304 like the real API
+        data = json.dumps(body, sort_keys=True).encode()
+        etag = f'"{hashlib.sha1(data).hexdigest()}"'
+        if self.headers.get("If-None-Match") == etag:
+            self._send(304, headers={"ETag": etag})
+        else:
+            self._send(200, body, {"ETag": etag})
+
+    def _dispatch(self, method: str):
+        wait = self.fake.take_token()
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length)) if length else {}
+        if wait > 0:
+            self._send(429, {"error": "TooManyRequests"}, {"Retry-After": str(wait)})
+            return
+        url = urllib.parse.urlsplit(self.path)
+        query = dict(urllib.parse.parse_qsl(url.query))
+        path = url.path.removeprefix("/api/v2")
+        for route_method, pattern, func in self.routes:
+            match = re.fullmatch(pattern, path)
+            if route_method == method and match:
+                status, result = func(self, query, body, *match.groups())
+                if method == "GET" and status == 200:
+                    self._send_validated(result)
+                else:
+                    self._send(status, result)
+                return
+        self._send(404, {"error": "RecordNotFound"})
+
+    def do_DELETE(self):
+        self._dispatch("DELETE")
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def do_PUT(self):
+        self._dispatch("PUT")
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.headers.get('Host')}/api/v2"
+
+    def cursor_page(self, kind: str, record, count: int, query: dict):
+        # record(i) builds the i-th of count records; only the page is built
+        size = int(query.get("page[size]", 100))
+        offset = int(query.get("page[after]") or 0)
+        end = min(offset + size, count)
+        has_more = end < count
+        return {
+            kind: [record(i) for i in range(offset, end)],
+            "meta": {
+                "has_more": has_more,
+                "after_cursor": str(end) if has_more else None,
+            },
+        }
+
+    # handlers
+
+    def list_collection(self, query, body, kind):
+        method, count = self.fake.collections[kind]
+        page = self.cursor_page(kind, getattr(self.fake, method), count, query)
+        if kind == "users" and query.get("include"):
+            self.sideload_users(page, query.get("include").split(","))
+        return 200, page
+
+    def sideload_users(self, page: dict, include: list[str]):
+        indexes = [u["id"] - 1 for u in page["users"]]
+        if "identities" in include:
+            page["identities"] = [self.fake.identity(i) for i in indexes]
+        if "organizations" in include:
+            org_ids = set()
+            for user, i in zip(page["users"], indexes):
+                user["organization_ids"] = self.fake.user_organization_ids(i)
+                org_ids.update(user["organization_ids"])
+            page["organizations"] = [
+                self.fake.organization(j - 1) for j in sorted(org_ids)
+            ]
+        if "groups" in include:
+            group_ids = set()
+            for user, i in zip(page["users"], indexes):
+                user["group_ids"] = self.fake.user_group_ids(i)
+                group_ids.update(user["group_ids"])
+            page["groups"] = [self.fake.group(g - 1) for g in sorted(group_ids)]
+
+    def show_many(self, query, body, kind):
+        method, count = self.fake.collections[kind]
+        ids = [int(i) for i in query.get("ids", "").split(",") if i][:100]
+        records = [getattr(self.fake, method)(i - 1) for i in ids if 0 < i <= count]
+        return 200, {kind: records}
+
+    def list_tickets(self, query, body):
+        page = int(query.get("page", 1))
+        per_page = int(query.get("per_page", 100))
+        start = (page - 1) * per_page
+        end = min(start + per_page, self.fake.n_tickets)
+        tickets = [self.fake.ticket(t) for t in range(start, end)]
+        next_page = None
+        if end < self.fake.n_tickets:
+            next_page = f"{self.base_url}/tickets.json?page={page + 1}"
+        return 200, {"tickets": tickets, "next_page": next_page}
+
+    def list_comments(self, query, body, ticket_id):
+        t = int(ticket_id)
+
+        def comment(c: int) -> dict:
+            return {"id": t * 10 + c, "html_body": f"<h5>From user{t}@example.com</h5>"}
+
+        return 200, self.cursor_page("comments", comment, 3, query)
+
+    def list_identities(self, query, body, user_id):
+        identity = self.fake.identity(int(user_id) - 1)
+        return 200, {"identities": [identity], "next_page": None}
+
+    def search(self, query, body):
+        page = int(query.get("page", 1))
+        if page * 100 > 1000:
+            return 422, {"error": "invalid", "description": "Search is capped"}
+        count, nth = self.fake.search_index(query.get("query", ""))
+        end = min(page * 100, count)
+        results = [self.fake.ticket(nth(k)) for k in range((page - 1) * 100, end)]
+        next_page = None
+        if end < count:
+            next_page = f"{self.base_url}/search.json?page={page + 1}"
+        return 200, {"results": results, "next_page": next_page}
+
+    def search_export(self, query, body):
+        count, nth = self.fake.search_index(query.get("query", ""))
+
+        def result(k: int) -> dict:
+            return self.fake.ticket(nth(k))
+
+        return 200, self.cursor_page("results", result, count, query)
+
+    def incremental_cursor(self, query, body, kind):
+        method, count = self.fake.collections[kind]
+        per_page = int(query.get("per_page", 1000))
+        if "cursor" in query:
+            offset = int(query.get("cursor"))
+        else:
+            step = 60 if kind == "tickets" else 1
+            start_time = int(query.get("start_time", 0))
+            offset = min(count, max(0, math.ceil((start_time - BASE_TIME) / step)))
+        end = min(offset + per_page, count)
+        records = [getattr(self.fake, method)(i) for i in range(offset, end)]
+        return 200, {
+            kind: records,
+            "after_cursor": str(end),
+            "end_of_stream": end >= count,
+        }
+
+    def incremental_organizations(self, query, body):
+        count = self.fake.n_orgs
+        per_page = int(query.get("per_page", 1000))
+        start_time = int(query.get("start_time", 0))
+        offset = min(count, max(0, start_time - BASE_TIME))
+        end = min(offset + per_page, count)
+        records = [self.fake.organization(j) for j in range(offset, end)]
+        end_time = BASE_TIME + end
+        return 200, {
+            "organizations": records,
+            "end_time": end_time,
+            "end_of_stream": end >= count,
+            "next_page": f"{self.base_url}/incremental/organizations.json"
+            f"?start_time={end_time}&per_page={per_page}",
+        }
+
+    def update_one(self, query, body, kind, record_id):
+        singular = kind[:-1]
+        record = self.fake.update_record(kind, int(record_id), body.get(singular))
+        return 200, {singular: record}
+
+    def update_many(self, query, body, kind):
+        if self.fake.too_many_jobs():
+            return 429, {"error": "TooManyJobs"}
+        results = []
+        if "ids" in query:
+            params = body.get(kind[:-1])
+            for record_id in query.get("ids").split(","):
+                self.fake.update_record(kind, int(record_id), params)
+                results.append({"id": int(record_id), "success": True})
+        else:
+            for params in body.get(kind):
+                record_id = params.pop("id")
+                self.fake.update_record(kind, record_id, params)
+                results.append({"id": record_id, "success": True})
+        return 200, self.fake.job(results)
+
+    def create_or_update_users(self, query, body):
+        if self.fake.too_many_jobs():
+            return 429, {"error": "TooManyJobs"}
+        results = [
+            {"id": u.get("id"), "status": "Updated", "success": True}
+            for u in body.get("users")
+        ]
+        return 200, self.fake.job(results)
+
+    def create_memberships(self, query, body):
+        if self.fake.too_many_jobs():
+            return 429, {"error": "TooManyJobs"}
+        results = [
+            {"id": i, "status": "Created", "success": True}
+            for i, _ in enumerate(body.get("organization_memberships"))
+        ]
+        return 200, self.fake.job(results)
+
+    def create_membership(self, query, body):
+        return 201, body
+
+    def destroy_memberships(self, query, body):
+        if self.fake.too_many_jobs():
+            return 429, {"error": "TooManyJobs"}
+        results = [
+            {"id": int(i), "status": "Deleted", "success": True}
+            for i in query.get("ids").split(",")
+        ]
+        return 200, self.fake.job(results)
+
+    def unassign_organization(self, query, body, user_id, org_id):
+        return 204, None
+
+    def job_status(self, query, body, job_id):
+        job = self.fake.job_status(job_id)
+        if job is None:
+            return 404, {"error": "RecordNotFound"}
+        return 200, {"job_status": job}
+
+    def job_statuses(self, query, body):
+        ids = query.get("ids", "").split(",")
+        jobs = [self.fake.job_status(job_id) for job_id in ids]
+        return 200, {"job_statuses": [j for j in jobs if j is not None]}
+
+    def ticket_fields(self, query, body):
+        field = {
+            "id": 360000398388,
+            "title": "Quality",
+            "type": "tagger",
+            "custom_field_options": [{"id": 1, "name": "Done", "value": "done"}],
+        }
+        return 200, {"ticket_fields": [field]}
+
+    def ticket_field_options(self, query, body, field_id):
+        options = [{"id": 1, "name": "Done", "value": "done"}]
+        return 200, {"custom_field_options": options, "next_page": None}
+
+
+Handler.routes = [
+    ("GET", r"/(users|organizations|groups)\.json", Handler.list_collection),
+    (
+        "GET",
+        r"/(group_memberships|organization_memberships)\.json",
+        Handler.list_collection,
+    ),
+    ("GET", r"/(users)/show_many\.json", Handler.show_many),
+    ("GET", r"/tickets\.json", Handler.list_tickets),
+    ("GET", r"/tickets/(\d+)/comments\.json", Handler.list_comments),
+    ("GET", r"/users/(\d+)/identities\.json", Handler.list_identities),
+    ("GET", r"/search\.json", Handler.search),
+    ("GET", r"/search/export\.json", Handler.search_export),
+    ("GET", r"/incremental/(tickets|users)/cursor\.json", Handler.incremental_cursor),
+    ("GET", r"/incremental/organizations\.json", Handler.incremental_organizations),
+    ("GET", r"/job_statuses/show_many\.json", Handler.job_statuses),
+    ("GET", r"/job_statuses/(\w+)\.json", Handler.job_status),
+    ("GET", r"/ticket_fields\.json", Handler.ticket_fields),
+    ("GET", r"/ticket_fields/(\d+)/options\.json", Handler.ticket_field_options),
+    ("PUT", r"/(tickets|users|organizations)/(\d+)\.json", Handler.update_one),
+    (
+        "PUT",
+        r"/(tickets|users|organizations)/update_many\.json",
+        Handler.update_many,
+    ),
+    ("POST", r"/users/create_or_update_many\.json", Handler.create_or_update_users),
+    ("POST", r"/organization_memberships\.json", Handler.create_membership),
+    (
+        "POST",
+        r"/organization_memberships/create_many\.json",
+        Handler.create_memberships,
+    ),
+    (
+        "DELETE",
+        r"/organization_memberships/destroy_many\.json",
+        Handler.destroy_memberships,
+    ),
+    (
+        "DELETE",
+        r"/users/(\d+)/organizations/(\d+)\.json",
+        Handler.unassign_organization,
+    ),
+]
+
+
+def make_server(
+    fake: FakeZendesk, host: str = "127.0.0.1", port: int = 0
+) -> http.server.ThreadingHTTPServer:
+    handler = type("FakeZendeskHandler", (Handler,), {"fake": fake})
+    server = http.server.ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", default=8000, type=int)
+    parser.add_argument("--users", default=10000, type=int)
+    parser.add_argument("--tickets", type=int)
+    parser.add_argument("--rate-per-minute", default=100000, type=int)
+    return parser.parse_args()
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    args = parse_args()
+    fake = FakeZendesk(args.users, args.tickets, rate_per_minute=args.rate_per_minute)
+    server = make_server(fake, args.host, args.port)
+    log.info(f"Serving a fake Zendesk on http://{args.host}:{server.server_port}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -27,7 +27,7 @@ def main():
 
     log.info(f"Collecting options for ticket field: {args.field_title}")
 
-    z = zendesk.ZendeskClient(s.zendesk_company, s.zendesk_username, s.zendesk_password)
+    z = zendesk.ZendeskClient.from_settings(s)
     tf_options = []
     for tf in z.ticket_fields:
         if tf.title == args.field_title:
@@ -13,13 +13,13 @@ log = logging.getLogger(__name__)
 
 def main():
     s = settings.Settings()
-    z = zendesk.ZendeskClient(s.zendesk_company, s.zendesk_username, s.zendesk_password)
+    z = zendesk.ZendeskClient.from_settings(s)
     group_id = int(os.getenv("GROUP_ID"))
     m = list(z.list_memberships_for_group(group_id))
     log.info(f"Found {len(m)} memberships for group {group_id}")
+    users = z.get_users_by_ids(x.user_id for x in m)
     for x in m:
-        u = z.get_user_by_id(x.user_id)
-        print(u.email)
+        print(users.get(x.user_id).email)
 
 
 if __name__ == "__main__":
@@ -1,13 +1,38 @@
-import csv
+import asyncio
 import os
 import sys
 import zendesk
 
 
 def main():
-    csv_writer = csv.writer(sys.stdout)
-    csv_writer.writerow(
+    company = os.getenv("ZENDESK_COMPANY")
+    username = os.getenv("ZENDESK_USERNAME")
+    password = os.getenv("ZENDESK_PASSWORD")
+    az = zendesk.AsyncZendeskClient(company, username, password)
+    asyncio.run(az.load())
+    z = az.client
+
+    users = z.users_table(
         [
+            "id",
+            "name",
+            "external_id",
+            "active",
+            "verified",
+            "last_login_at",
+            "email",
+            "organizations",
+            "role",
+            "groups",
+            "restricted_agent",
+            "ticket_restriction",
+            "suspended",
+            "org_tags",
+        ]
+    )
+    users.to_csv(
+        sys.stdout,
+        header=[
             "user_id",
             "name",
             "employee_id",
@@ -22,38 +47,8 @@ def main():
             "ticket_restriction",
             "suspended",
             "org_tags",
-        ]
+        ],
     )
-    company = os.getenv("ZENDESK_COMPANY")
-    username = os.getenv("ZENDESK_USERNAME")
-    password = os.getenv("ZENDESK_PASSWORD")
-    z = zendesk.ZendeskClient(company, username, password)
-
-    for user in z.users:
-        org_names = "|".join(sorted([o.name for o in user.organizations]))
-        group_names = "|".join(sorted([g.name for g in user.groups]))
-        org_tags = set()
-        for o in user.organizations:
-            org_tags.update(o.tags)
-        org_tags = "|".join(sorted(org_tags))
-        csv_writer.writerow(
-            [
-                user.id,
-                user.name,
-                user.external_id,
-                user.active,
-                user.verified,
-                user.last_login_at,
-                user.email,
-                org_names,
-                user.role,
-                group_names,
-                user.restricted_agent,
-                user.ticket_restriction,
-                user.suspended,
-                org_tags,
-            ]
-        )
 
 
 if __name__ == "__main__":
@@ -0,0 +1,172 @@
+import json
+import logging
+import metrics
+import pathlib
+import sqlite3
+import threading
+import time
+import urllib.parse
+
+log = logging.getLogger(__name__)
+
+# endpoint template -> seconds a cached response is served without asking the
+# server; after that the response is revalidated with a conditional request
+DEFAULT_TTLS = {
+    "/groups.json": 3600,
+    "/organizations.json": 3600,
+    "/ticket_fields.json": 86400,
+    "/ticket_fields/{id}/options.json": 86400,
+}
+
+
+class CacheEntry:
+    def __init__(self, body: bytes, etag: str, last_modified: str, stored_at: float):
+        self.body = body
+        self.etag = etag
+        self.last_modified = last_modified
+        self.stored_at = stored_at
+
+    @property
+    def conditional_headers(self) -> dict:
+        headers = {}
+        if self.etag is not None:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified is not None:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+    def json(self):
+        return json.loads(self.body)
+
+
+class HttpCache:
+    def __init__(
+        self,
+        path: pathlib.Path,
+        max_bytes: int = 64 * 1024 * 1024,
+        ttls: dict[str, float] = None,
+    ):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttls = DEFAULT_TTLS if ttls is None else ttls
+        self.lock = threading.Lock()
+        # the client fetches pages on background threads, all access to the
+        # connection goes through the lock
+        self.cnx = sqlite3.connect(path, check_same_thread=False)
+        with self.cnx:
+            self.cnx.execute(
+                "create table if not exists responses (key text primary key, "
+                "body blob not null, etag text, last_modified text, "
+                "stored_at real not null, used_at real not null, size integer not null)"
+            )
+            self.cnx.execute(
+                "create index if not exists responses_used_at on responses (used_at)"
+            )
+
+    @staticmethod
+    def key(url: str, params: dict = None, username: str = None) -> str:
+        # the host and the user are part of the key, so clients for different
+        # accounts or different users can share a cache file
+        parts = urllib.parse.urlsplit(url)
+        query = urllib.parse.parse_qsl(parts.query)
+        query.extend((k, str(v)) for k, v in (params or {}).items())
+        user = "" if username is None else f"{urllib.parse.quote(username)}@"
+        return (
+            f"{parts.scheme}://{user}{parts.netloc}{parts.path}"
+            f"?{urllib.parse.urlencode(sorted(query))}"
+        )
+
+    @staticmethod
+    def resource(url: str) -> tuple[str, str, str]:
+        # (scheme, host, first path segment after /api/v2), the collection a
+        # URL or a cache key belongs to, for any user
+        parts = urllib.parse.urlsplit(url)
+        path = parts.path.removeprefix("/api/v2")
+        name = path.lstrip("/").split("/")[0].removesuffix(".json")
+        return parts.scheme, parts.netloc.rpartition("@")[2], name
+
+    def invalidate(self, url: str):
+        # a write through url drops the cached pages of its collection, so
+        # /organizations/1.json drops /organizations.json for every user
+        scheme, host, name = self.resource(url)
+        if not any(t.split("/")[1].removesuffix(".json") == name for t in self.ttls):
+            return
+        with self.lock, self.cnx:
+            keys = self.cnx.execute("select key from responses").fetchall()
+            stale = [(k,) for (k,) in keys if self.resource(k) == (scheme, host, name)]
+            self.cnx.executemany("delete from responses where key = ?", stale)
+        if stale:
+            log.debug(f"Dropped {len(stale)} cached responses after a write to {url}")
+
+    def ttl(self, url: str) -> float | None:
+        # None means responses from this endpoint are not cached
+        path = urllib.parse.urlsplit(url).path
+        return self.ttls.get(metrics.endpoint_template(path))
+
+    def clear(self):
+        with self.lock, self.cnx:
+            self.cnx.execute("delete from responses")
+
+    def close(self):
+        self.cnx.close()
+
+    def get(self, key: str) -> CacheEntry | None:
+        with self.lock, self.cnx:
+            row = self.cnx.execute(
+                "select body, etag, last_modified, stored_at from responses "
+                "where key = ?",
+                (key,),
+            ).fetchone()
+            if row is None:
+                return None
+            self.cnx.execute(
+                "update responses set used_at = ? where key = ?", (time.time(), key)
+            )
+        return CacheEntry(*row)
+
+    def is_fresh(self, url: str, entry: CacheEntry) -> bool:
+        return time.time() - entry.stored_at < self.ttl(url)
+
+    def put(self, key: str, body: bytes, etag: str = None, last_modified: str = None):
+        if len(body) > self.max_bytes:
+            return
+        now = time.time()
+        with self.lock, self.cnx:
+            self.cnx.execute(
+                "insert into responses "
+                "(key, body, etag, last_modified, stored_at, used_at, size) "
+                "values (?, ?, ?, ?, ?, ?, ?) on conflict (key) do update set "
+                "body = excluded.body, etag = excluded.etag, "
+                "last_modified = excluded.last_modified, "
+                "stored_at = excluded.stored_at, used_at = excluded.used_at, "
+                "size = excluded.size",
+                (key, body, etag, last_modified, now, now, len(body)),
+            )
+            self._evict()
+
+    def touch(self, key: str):
+        # a 304 response confirms the stored body, it is fresh again
+        now = time.time()
+        with self.lock, self.cnx:
+            self.cnx.execute(
+                "update responses set stored_at = ?, used_at = ? where key = ?",
+                (now, now, key),
+            )
+
+    def _evict(self):
+        (total,) = self.cnx.execute(
+            "select coalesce(sum(size), 0) from responses"
+        ).fetchone()
+        if total <= self.max_bytes:
+            return
+        rows = self.cnx.execute(
+            "select key, size from responses order by used_at"
+        ).fetchall()
+        evicted = []
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            evicted.append((key,))
+            total -= size
+        self.cnx.executemany("delete from responses where key = ?", evicted)
+        log.debug(f"Evicted {len(evicted)} responses from {self.path}")
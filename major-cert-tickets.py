@@ -33,20 +33,20 @@ class MajorCertParser(html.parser.HTMLParser):
 
 def main():
     s = settings.Settings()
-    z = zendesk.ZendeskClient(s.zendesk_company, s.zendesk_username, s.zendesk_password)
+    z = zendesk.ZendeskClient.from_settings(s)
     query = 'subject:"Major certification request for"'
     out = pathlib.Path("major-cert-tickets.csv")
     with out.open(mode="w", newline="") as f:
         csv_file = csv.writer(f)
         csv_file.writerow(["id", "subject", "created_at", "submitter", "video_url"])
-        for t in z.search_tickets(query, "created_at", "asc"):
-            for c in t.comments:
+        tickets = z.search_tickets(query, "created_at", "asc")
+        for t, comments in z.iter_ticket_comments(tickets, limit=1):
+            for c in comments:
                 parser = MajorCertParser()
                 parser.feed(c.html_body)
                 csv_file.writerow(
                     [t.id, t.subject, t.created_at, parser.email, parser.href]
                 )
-                break
 
 
 if __name__ == "__main__":
@@ -0,0 +1,171 @@
+import atexit
+import bisect
+import json
+import logging
+import pathlib
+import re
+import threading
+
+from typing import Callable
+
+log = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def endpoint_template(path: str) -> str:
+    # /api/v2/users/123/identities.json -> /users/{id}/identities.json; job
+    # ids are hex strings rather than numbers
+    path = path.removeprefix("/api/v2")
+    path = re.sub(r"/\d+(?=/|\.json|$)", "/{id}", path)
+    return re.sub(
+        r"(/job_statuses)/(?!show_many\.json)[^/]+?(?=/|\.json|$)", r"\1/{id}", path
+    )
+
+
+class EndpointMetrics:
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.rate_limited = 0
+        self.retries = 0
+        self.bytes = 0
+        self.seconds = 0.0
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.rate_limit_remaining = None
+
+    def as_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "rate_limited": self.rate_limited,
+            "retries": self.retries,
+            "bytes": self.bytes,
+            "seconds": round(self.seconds, 6),
+            "buckets": dict(zip([*map(str, LATENCY_BUCKETS), "+Inf"], self.buckets)),
+            "rate_limit_remaining": self.rate_limit_remaining,
+        }
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.endpoints = {}
+        self.collectors = []
+
+    def add_bytes(self, method: str, path: str, nbytes: int):
+        # streamed bodies are counted once they have been read
+        key = (method, endpoint_template(path))
+        with self.lock:
+            m = self.endpoints.get(key)
+            if m is None:
+                m = self.endpoints[key] = EndpointMetrics()
+            m.bytes += nbytes
+
+    def add_collector(self, collector: Callable[[dict], None]):
+        # collectors are called with one event dict per HTTP attempt
+        self.collectors.append(collector)
+
+    def export(self, path: pathlib.Path):
+        if path.suffix == ".prom":
+            content = self.to_prometheus()
+        else:
+            content = json.dumps(self.to_dict(), indent=2, sort_keys=True)
+        tmp = path.with_name(f"{path.name}.tmp")
+        tmp.write_text(content)
+        tmp.replace(path)
+        log.info(f"Wrote request metrics to {path}")
+
+    def export_at_exit(self, path: pathlib.Path):
+        atexit.register(self.export, path)
+
+    def record(
+        self,
+        method: str,
+        path: str,
+        status: int = None,
+        seconds: float = 0.0,
+        nbytes: int = 0,
+        retry: bool = False,
+        rate_limit_remaining: int = None,
+        transient_retries: int = 0,
+    ):
+        # retry marks an attempt repeated after a 429; transient_retries counts
+        # the connection and 5xx retries the adapter made within the attempt
+        key = (method, endpoint_template(path))
+        with self.lock:
+            m = self.endpoints.get(key)
+            if m is None:
+                m = self.endpoints[key] = EndpointMetrics()
+            m.count += 1
+            m.seconds += seconds
+            m.bytes += nbytes
+            m.buckets[bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+            if status is None or status >= 500:
+                m.errors += 1
+            if status == 429:
+                m.rate_limited += 1
+            m.retries += int(retry) + transient_retries
+            if rate_limit_remaining is not None:
+                m.rate_limit_remaining = rate_limit_remaining
+        event = {
+            "method": key[0],
+            "endpoint": key[1],
+            "status": status,
+            "seconds": seconds,
+            "bytes": nbytes,
+            "retry": retry,
+            "rate_limit_remaining": rate_limit_remaining,
+            "transient_retries": transient_retries,
+        }
+        for collector in self.collectors:
+            collector(event)
+
+    def to_dict(self) -> dict:
+        with self.lock:
+            return {
+                f"{method} {endpoint}": m.as_dict()
+                for (method, endpoint), m in sorted(self.endpoints.items())
+            }
+
+    def to_prometheus(self) -> str:
+        lines = []
+        counters = (
+            ("requests_total", "count"),
+            ("request_errors_total", "errors"),
+            ("requests_rate_limited_total", "rate_limited"),
+            ("request_retries_total", "retries"),
+            ("response_bytes_total", "bytes"),
+        )
+        with self.lock:
+            items = sorted(self.endpoints.items())
+            for name, attr in counters:
+                lines.append(f"# TYPE zendesk_{name} counter")
+                for (method, endpoint), m in items:
+                    labels = f'method="{method}",endpoint="{endpoint}"'
+                    lines.append(f"zendesk_{name}{{{labels}}} {getattr(m, attr)}")
+            lines.append("# TYPE zendesk_request_duration_seconds histogram")
+            for (method, endpoint), m in items:
+                labels = f'method="{method}",endpoint="{endpoint}"'
+                cumulative = 0
+                for le, n in zip([*map(str, LATENCY_BUCKETS), "+Inf"], m.buckets):
+                    cumulative += n
+                    lines.append(
+                        f'zendesk_request_duration_seconds_bucket{{{labels},le="{le}"}} '
+                        f"{cumulative}"
+                    )
+                lines.append(
+                    f"zendesk_request_duration_seconds_sum{{{labels}}} {m.seconds}"
+                )
+                lines.append(
+                    f"zendesk_request_duration_seconds_count{{{labels}}} {m.count}"
+                )
+            lines.append("# TYPE zendesk_rate_limit_remaining gauge")
+            for (method, endpoint), m in items:
+                if m.rate_limit_remaining is None:
+                    continue
+                labels = f'method="{method}",endpoint="{endpoint}"'
+                lines.append(
+                    f"zendesk_rate_limit_remaining{{{labels}}} {m.rate_limit_remaining}"
+                )
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,120 @@
+import csv
+import logging
+import pathlib
+
+from typing import Callable, Iterable, Iterator, NamedTuple
+
+log = logging.getLogger(__name__)
+
+LEFT_ONLY = "left_only"
+RIGHT_ONLY = "right_only"
+MISMATCH = "mismatch"
+MATCH = "match"
+
+
+class Diff(NamedTuple):
+    status: str
+    left: dict
+    right: dict
+    fields: tuple[str, ...] = ()
+
+
+def normalize_email(value: str) -> str:
+    # some exports hold several addresses separated by spaces, the first one
+    # is the primary address
+    parts = (value or "").split()
+    return parts[0].casefold() if parts else None
+
+
+def normalize_id(value: str) -> str:
+    value = str(value or "").strip()
+    return value.casefold() or None
+
+
+def normalize_value(value: str) -> str:
+    return " ".join(str(value or "").split()).casefold()
+
+
+def iter_csv(path: pathlib.Path) -> Iterator[dict]:
+    with open(path, newline="") as f:
+        yield from csv.DictReader(f)
+
+
+def smaller_side(left: pathlib.Path, right: pathlib.Path) -> str:
+    left_size = pathlib.Path(left).stat().st_size
+    right_size = pathlib.Path(right).stat().st_size
+    return "left" if left_size < right_size else "right"
+
+
+def reconcile(
+    left: Iterable[dict],
+    right: Iterable[dict],
+    left_key: Callable[[dict], tuple[str, str]],
+    right_key: Callable[[dict], tuple[str, str]],
+    compare: dict[str, tuple[str, str]] = None,
+    build: str = "right",
+    include_matches: bool = False,
+) -> Iterator[Diff]:
+    # hash join: the build side is indexed by email and by secondary id, the
+    # other side is streamed past the index once; build rows that are still
+    # unmatched at the end are reported last, so memory is bounded by the
+    # build side, which should be the smaller one
+    compare = compare or {}
+    if build == "left":
+        build_rows, build_key, probe_rows, probe_key = left, left_key, right, right_key
+    else:
+        build_rows, build_key, probe_rows, probe_key = right, right_key, left, left_key
+
+    unmatched = {}
+    keys = {}
+    by_email = {}
+    by_id = {}
+    for i, row in enumerate(build_rows):
+        email, id_ = build_key(row)
+        unmatched[i] = row
+        keys[i] = (email, id_)
+        if email is not None:
+            by_email.setdefault(email, i)
+        if id_ is not None:
+            by_id.setdefault(id_, i)
+    log.debug(f"Indexed {len(unmatched)} {build} rows")
+
+    probe_only = RIGHT_ONLY if build == "left" else LEFT_ONLY
+    build_only = LEFT_ONLY if build == "left" else RIGHT_ONLY
+    for row in probe_rows:
+        email, id_ = probe_key(row)
+        i = by_email.get(email) if email is not None else None
+        if i is None or i not in unmatched:
+            i = by_id.get(id_) if id_ is not None else None
+        if i is None or i not in unmatched:
+            if build == "left":
+                yield Diff(probe_only, None, row)
+            else:
+                yield Diff(probe_only, row, None)
+            continue
+        match = unmatched.pop(i)
+        match_email, match_id = keys.pop(i)
+        if build == "left":
+            left_row, right_row = match, row
+        else:
+            left_row, right_row = row, match
+
+        fields = []
+        if email != match_email:
+            fields.append("email")
+        if id_ is not None and match_id is not None and id_ != match_id:
+            fields.append("id")
+        for name, (left_field, right_field) in compare.items():
+            left_value = normalize_value(left_row.get(left_field))
+            if left_value != normalize_value(right_row.get(right_field)):
+                fields.append(name)
+        if fields:
+            yield Diff(MISMATCH, left_row, right_row, tuple(fields))
+        elif include_matches:
+            yield Diff(MATCH, left_row, right_row)
+
+    for row in unmatched.values():
+        if build == "left":
+            yield Diff(build_only, row, None)
+        else:
+            yield Diff(build_only, None, row)
@@ -13,10 +13,13 @@ def main():
         log.debug(f"Changing log level to {s.log_level}")
     logging.getLogger().setLevel(s.log_level)
 
-    z = zendesk.ZendeskClient(s.zendesk_company, s.zendesk_username, s.zendesk_password)
-    for org in z.organizations:
-        if "Presales" in org.name:
-            org.name = org.name.replace("Presales", "PreSales")
+    z = zendesk.ZendeskClient.from_settings(s)
+    with z.batch() as batch:
+        for org in z.organizations:
+            if "Presales" in org.name:
+                org.name = org.name.replace("Presales", "PreSales")
+    for failure in batch.failures:
+        log.error(f"Could not rename organization {failure.get('id')}: {failure}")
 
 
 if __name__ == "__main__":
@@ -7,6 +7,17 @@ class Settings:
     def external_id_file(self) -> pathlib.Path:
         return pathlib.Path(os.getenv("EXTERNAL_ID_FILE", "/data.csv")).resolve()
 
+    @property
+    def http_cache_file(self) -> pathlib.Path | None:
+        value = os.getenv("HTTP_CACHE_FILE")
+        if value is None:
+            return None
+        return pathlib.Path(value).resolve()
+
+    @property
+    def http_cache_max_mb(self) -> int:
+        return int(os.getenv("HTTP_CACHE_MAX_MB", "64"))
+
     @property
     def log_format(self) -> str:
         return os.getenv("LOG_FORMAT", "%(levelname)s [%(name)s] %(message)s")
@@ -15,14 +26,64 @@ class Settings:
     def log_level(self) -> str:
         return os.getenv("LOG_LEVEL", "INFO")
 
+    @property
+    def metrics_file(self) -> pathlib.Path | None:
+        value = os.getenv("METRICS_FILE")
+        if value is None:
+            return None
+        return pathlib.Path(value).resolve()
+
+    @property
+    def postgres_dsn(self) -> str:
+        return os.getenv("POSTGRES_DSN")
+
+    @property
+    def snapshot_file(self) -> pathlib.Path | None:
+        value = os.getenv("SNAPSHOT_FILE")
+        if value is None:
+            return None
+        return pathlib.Path(value).resolve()
+
+    @property
+    def zendesk_backoff_factor(self) -> float:
+        return float(os.getenv("ZENDESK_BACKOFF_FACTOR", "0.5"))
+
+    @property
+    def zendesk_backoff_jitter(self) -> float:
+        return float(os.getenv("ZENDESK_BACKOFF_JITTER", "0.5"))
+
     @property
     def zendesk_company(self) -> str:
         return os.getenv("ZENDESK_COMPANY")
 
+    @property
+    def zendesk_compression(self) -> bool:
+        return os.getenv("ZENDESK_COMPRESSION", "true").lower() in ("1", "true", "yes")
+
+    @property
+    def zendesk_connect_timeout(self) -> float:
+        return float(os.getenv("ZENDESK_CONNECT_TIMEOUT", "10"))
+
     @property
     def zendesk_password(self) -> str:
         return os.getenv("ZENDESK_PASSWORD")
 
+    @property
+    def zendesk_pool_connections(self) -> int:
+        return int(os.getenv("ZENDESK_POOL_CONNECTIONS", "10"))
+
+    @property
+    def zendesk_pool_maxsize(self) -> int:
+        return int(os.getenv("ZENDESK_POOL_MAXSIZE", "10"))
+
+    @property
+    def zendesk_read_timeout(self) -> float:
+        return float(os.getenv("ZENDESK_READ_TIMEOUT", "60"))
+
+    @property
+    def zendesk_retries(self) -> int:
+        return int(os.getenv("ZENDESK_RETRIES", "3"))
+
     @property
     def zendesk_username(self) -> str:
         return os.getenv("ZENDESK_USERNAME")
@@ -0,0 +1,132 @@
+import datetime
+import json
+import logging
+import pathlib
+import sqlite3
+import zendesk
+
+log = logging.getLogger(__name__)
+
+
+class ZendeskSnapshot:
+    collections = {
+        "group_memberships": zendesk.ZendeskGroupMembership,
+        "groups": zendesk.ZendeskGroup,
+        "organization_memberships": zendesk.ZendeskOrganizationMembership,
+        "organizations": zendesk.ZendeskOrganization,
+        "users": zendesk.ZendeskUser,
+    }
+
+    # collections with an incremental export endpoint are refreshed from the
+    # stored cursor, the others are downloaded again once they are too old
+    incremental = ("organizations", "users")
+
+    # memberships that refer to a record, removed together with it
+    dependents = {
+        "organizations": (("organization_memberships", "organization_id"),),
+        "users": (
+            ("group_memberships", "user_id"),
+            ("organization_memberships", "user_id"),
+        ),
+    }
+
+    def __init__(
+        self,
+        path: pathlib.Path,
+        max_age: datetime.timedelta = datetime.timedelta(days=1),
+    ):
+        self.path = path
+        self.max_age = max_age
+        self.cnx = sqlite3.connect(path)
+        with self.cnx:
+            for name in self.collections:
+                self.cnx.execute(
+                    f"create table if not exists {name} "
+                    "(id integer primary key, data text not null)"
+                )
+            self.cnx.execute(
+                "create table if not exists cursors "
+                "(name text primary key, cursor text, refreshed_at text not null)"
+            )
+
+    def _get_cursor(self, name: str) -> tuple[str, datetime.datetime]:
+        row = self.cnx.execute(
+            "select cursor, refreshed_at from cursors where name = ?", (name,)
+        ).fetchone()
+        if row is None:
+            return None, None
+        return row[0], datetime.datetime.fromisoformat(row[1])
+
+    def _set_cursor(self, name: str, cursor: str):
+        now = datetime.datetime.now(datetime.UTC).isoformat()
+        self.cnx.execute(
+            "insert into cursors (name, cursor, refreshed_at) values (?, ?, ?) "
+            "on conflict (name) do update "
+            "set cursor = excluded.cursor, refreshed_at = excluded.refreshed_at",
+            (name, cursor, now),
+        )
+
+    def _refresh_full(self, client: zendesk.ZendeskClient, name: str):
+        log.info(f"Downloading all {name} into {self.path}")
+        records = getattr(client, name)
+        with self.cnx:
+            self.cnx.execute(f"delete from {name}")
+            self.cnx.executemany(
+                f"insert into {name} (id, data) values (?, ?)",
+                [(r.id, json.dumps(dict(r))) for r in records],
+            )
+            self._set_cursor(name, None)
+
+    def _refresh_incremental(self, client: zendesk.ZendeskClient, name: str):
+        cursor, _ = self._get_cursor(name)
+        log.info(f"Refreshing {name} in {self.path} from cursor {cursor}")
+        changed = 0
+        for data, page_cursor in client.get_incremental_pages(name, cursor=cursor):
+            upserts = []
+            deletes = []
+            for r in data.get(name, []):
+                if r.get("deleted_at") is not None or r.get("active") is False:
+                    deletes.append((r.get("id"),))
+                else:
+                    upserts.append((r.get("id"), json.dumps(r)))
+            with self.cnx:
+                self.cnx.executemany(
+                    f"insert into {name} (id, data) values (?, ?) "
+                    "on conflict (id) do update set data = excluded.data",
+                    upserts,
+                )
+                self.cnx.executemany(f"delete from {name} where id = ?", deletes)
+                for table, column in self.dependents.get(name, ()):
+                    self.cnx.executemany(
+                        f"delete from {table} "
+                        f"where json_extract(data, '$.{column}') = ?",
+                        deletes,
+                    )
+                if page_cursor is not None:
+                    self._set_cursor(name, page_cursor)
+            changed += len(upserts) + len(deletes)
+        log.info(f"Refreshed {changed} {name}")
+
+    def attach(self, client: zendesk.ZendeskClient):
+        # refresh the snapshot, then hand its records to the client in place
+        # of the collections it would otherwise download
+        self.refresh(client)
+        client.clear_cache()
+        for name, model in self.collections.items():
+            rows = self.cnx.execute(f"select data from {name} order by id")
+            records = [client.record(model, json.loads(data)) for (data,) in rows]
+            log.debug(f"Loaded {len(records)} {name} from {self.path}")
+            setattr(client, f"_{name}", records)
+
+    def close(self):
+        self.cnx.close()
+
+    def refresh(self, client: zendesk.ZendeskClient):
+        now = datetime.datetime.now(datetime.UTC)
+        for name in self.collections:
+            if name in self.incremental:
+                self._refresh_incremental(client, name)
+                continue
+            _, refreshed_at = self._get_cursor(name)
+            if refreshed_at is None or now - refreshed_at > self.max_age:
+                self._refresh_full(client, name)
@@ -1,7 +1,6 @@
 import datetime
 import logging
 import readline
-import requests
 import settings
 import sys
 import zendesk
@@ -16,11 +15,12 @@ def main():
         log.debug(f"Changing log level to {s.log_level}")
     logging.getLogger().setLevel(s.log_level)
 
-    z = zendesk.ZendeskClient(s.zendesk_company, s.zendesk_username, s.zendesk_password)
-    query = f"type:ticket status<solved updated<{datetime.date.today() - datetime.timedelta(days=366)}"
-    data = z.search(query, sort_by="updated_at", sort_order="asc")
-    succeeded = 0
-    for result in data.get("results", []):
+    z = zendesk.ZendeskClient.from_settings(s)
+    query = (
+        f"status<solved updated<{datetime.date.today() - datetime.timedelta(days=366)}"
+    )
+    changes = {}
+    for result in z.search_export(query, "ticket"):
         ticket_id = result.get("id")
         subject = result.get("subject")
         updated_at = result.get("updated_at")[:10]
@@ -40,11 +40,19 @@ def main():
                         }
                     )
                 break
-        try:
-            z.update_ticket(ticket_id, params)
-            succeeded += 1
-        except requests.exceptions.HTTPError as e:
-            log.error(e)
+        changes[ticket_id] = params
+    try:
+        jobs = z.update_tickets_many(changes)
+        log.info(f"Submitted {len(changes)} tickets in {len(jobs)} jobs")
+    except zendesk.ZendeskJobsError as e:
+        # the jobs submitted before the error still run, report them
+        log.error(e)
+        jobs = e.jobs
+    succeeded = 0
+    for job in z.wait_for_jobs(jobs):
+        for r in job.failures:
+            log.error(f"{r.get('id')}: {r.get('error')} {r.get('details')}")
+        succeeded += len(job.results) - len(job.failures)
     log.info(f"Succeeded: {succeeded}")
 
 
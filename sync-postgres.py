@@ -0,0 +1,235 @@
+import csv
+import io
+import json
+import logging
+import psycopg2
+import settings
+import sys
+import zendesk
+
+log = logging.getLogger("zendesk_api.sync_postgres")
+
+# table name -> (columns with their types, collection source)
+# "incremental" tables are refreshed from a stored export cursor, "full"
+# tables are replaced by a complete download on every run
+TABLES = {
+    "users": (
+        {
+            "id": "bigint primary key",
+            "name": "text",
+            "email": "text",
+            "external_id": "text",
+            "role": "text",
+            "active": "boolean",
+            "suspended": "boolean",
+            "organization_id": "bigint",
+            "updated_at": "timestamptz",
+        },
+        "incremental",
+    ),
+    "organizations": (
+        {
+            "id": "bigint primary key",
+            "name": "text",
+            "external_id": "text",
+            "updated_at": "timestamptz",
+        },
+        "incremental",
+    ),
+    "tickets": (
+        {
+            "id": "bigint primary key",
+            "subject": "text",
+            "status": "text",
+            "requester_id": "bigint",
+            "organization_id": "bigint",
+            "group_id": "bigint",
+            "created_at": "timestamptz",
+            "updated_at": "timestamptz",
+        },
+        "incremental",
+    ),
+    "groups": (
+        {
+            "id": "bigint primary key",
+            "name": "text",
+            "deleted": "boolean",
+            "updated_at": "timestamptz",
+        },
+        "full",
+    ),
+    "group_memberships": (
+        {
+            "id": "bigint primary key",
+            "user_id": "bigint",
+            "group_id": "bigint",
+        },
+        "full",
+    ),
+    "organization_memberships": (
+        {
+            "id": "bigint primary key",
+            "user_id": "bigint",
+            "organization_id": "bigint",
+        },
+        "full",
+    ),
+}
+
+
+def create_tables(cnx):
+    with cnx, cnx.cursor() as cur:
+        for table, (columns, _) in TABLES.items():
+            defs = ", ".join(f"{c} {t}" for c, t in columns.items())
+            cur.execute(
+                f"create table if not exists zendesk_{table} ({defs}, data jsonb)"
+            )
+        cur.execute(
+            "create table if not exists zendesk_sync_cursors "
+            "(name text primary key, cursor text, synced_at timestamptz not null)"
+        )
+
+
+def get_cursor(cnx, table: str) -> str:
+    with cnx.cursor() as cur:
+        cur.execute("select cursor from zendesk_sync_cursors where name = %s", (table,))
+        row = cur.fetchone()
+    return None if row is None else row[0]
+
+
+def set_cursor(cur, table: str, cursor: str):
+    cur.execute(
+        "insert into zendesk_sync_cursors (name, cursor, synced_at) "
+        "values (%s, %s, now()) on conflict (name) do update "
+        "set cursor = excluded.cursor, synced_at = excluded.synced_at",
+        (table, cursor),
+    )
+
+
+def is_deleted(record: dict) -> bool:
+    return (
+        record.get("deleted_at") is not None
+        or record.get("active") is False
+        or record.get("status") == "deleted"
+    )
+
+
+def clean(value):
+    # Postgres text and jsonb cannot hold NUL characters
+    if isinstance(value, str):
+        return value.replace("\x00", "")
+    if isinstance(value, dict):
+        return {clean(k): clean(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [clean(v) for v in value]
+    return value
+
+
+def copy_records(cur, table: str, records, chunk_size: int = 10000) -> int:
+    # COPY records into a staging table in chunks, so memory is bounded by
+    # one chunk regardless of how many records the source yields; in CSV an
+    # unquoted empty field is NULL, so every value except None is quoted to
+    # keep empty strings. seq numbers the rows in the order they were read
+    columns = list(TABLES[table][0])
+    cur.execute(
+        f"create temp table if not exists stage_{table} "
+        f"(like zendesk_{table}, seq bigserial) on commit drop"
+    )
+    copy_sql = (
+        f"copy stage_{table} ({', '.join(columns)}, data) from stdin with (format csv)"
+    )
+    count = 0
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, quoting=csv.QUOTE_NOTNULL)
+    for record in records:
+        record = clean(record)
+        writer.writerow([record.get(c) for c in columns] + [json.dumps(record)])
+        count += 1
+        if count % chunk_size == 0:
+            buffer.seek(0)
+            cur.copy_expert(copy_sql, buffer)
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        buffer.seek(0)
+        cur.copy_expert(copy_sql, buffer)
+    return count
+
+
+def upsert_stage(cur, table: str):
+    # the exports can return a record more than once; the newest version is
+    # kept, and the last one read when versions have the same updated_at or
+    # the table has none. An older version never replaces a stored newer one
+    columns = [*TABLES[table][0], "data"]
+    updates = ", ".join(f"{c} = excluded.{c}" for c in columns if c != "id")
+    order = "id, seq desc"
+    newer = ""
+    if "updated_at" in columns:
+        order = "id, updated_at desc nulls last, seq desc"
+        newer = (
+            f" where zendesk_{table}.updated_at is null"
+            f" or excluded.updated_at >= zendesk_{table}.updated_at"
+        )
+    cur.execute(
+        f"insert into zendesk_{table} ({', '.join(columns)}) "
+        f"select distinct on (id) {', '.join(columns)} from stage_{table} "
+        f"order by {order} on conflict (id) do update set {updates}{newer}"
+    )
+
+
+def sync_full(cnx, z: zendesk.ZendeskClient, table: str):
+    records = (dict(r) for r in getattr(z, f"iter_{table}")())
+    with cnx, cnx.cursor() as cur:
+        count = copy_records(cur, table, records)
+        upsert_stage(cur, table)
+        cur.execute(
+            f"delete from zendesk_{table} t where not exists "
+            f"(select 1 from stage_{table} s where s.id = t.id)"
+        )
+        set_cursor(cur, table, None)
+    log.info(f"Synced {count} {table}")
+
+
+def sync_incremental(cnx, z: zendesk.ZendeskClient, table: str):
+    # each export page is staged, merged and checkpointed in one transaction
+    cursor = get_cursor(cnx, table)
+    log.info(f"Syncing {table} from cursor {cursor}")
+    total = 0
+    for data, page_cursor in z.get_incremental_pages(table, cursor=cursor):
+        records = data.get(table, [])
+        # pages are in update order, the last version of a record wins
+        latest = {r.get("id"): r for r in records}.values()
+        with cnx, cnx.cursor() as cur:
+            live = [r for r in latest if not is_deleted(r)]
+            deleted = [r.get("id") for r in latest if is_deleted(r)]
+            copy_records(cur, table, live)
+            upsert_stage(cur, table)
+            cur.execute(
+                f"delete from zendesk_{table} where id = any(%s::bigint[])", (deleted,)
+            )
+            if page_cursor is not None:
+                set_cursor(cur, table, page_cursor)
+        total += len(records)
+    log.info(f"Synced {total} changed {table}")
+
+
+def main():
+    s = settings.Settings()
+    logging.basicConfig(format=s.log_format, level=logging.DEBUG, stream=sys.stdout)
+    if not s.log_level == "DEBUG":
+        log.debug(f"Changing log level to {s.log_level}")
+    logging.getLogger().setLevel(s.log_level)
+
+    z = zendesk.ZendeskClient.from_settings(s)
+    cnx = psycopg2.connect(s.postgres_dsn)
+    create_tables(cnx)
+    for table, (_, source) in TABLES.items():
+        if source == "incremental":
+            sync_incremental(cnx, z, table)
+        else:
+            sync_full(cnx, z, table)
+    cnx.close()
+
+
+if __name__ == "__main__":
+    main()
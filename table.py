@@ -0,0 +1,130 @@
+import csv
+import datetime
+import logging
+
+from typing import Iterable, TextIO
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+log = logging.getLogger(__name__)
+
+
+def _to_datetime(value: str) -> datetime.datetime | None:
+    if value is None:
+        return None
+    return datetime.datetime.fromisoformat(value)
+
+
+def _naive_utc(value: datetime.datetime):
+    # datetime64 has no time zone; Zendesk timestamps are all UTC, so the
+    # zone is dropped here and put back in values()
+    if value is None:
+        return numpy.datetime64("NaT", "s")
+    return value.astimezone(datetime.UTC).replace(tzinfo=None)
+
+
+def _column(values: list, dtype: str):
+    if dtype == "bool":
+        values = [None if v is None else bool(v) for v in values]
+    elif dtype == "datetime64[s]":
+        values = [_to_datetime(v) for v in values]
+    if numpy is None:
+        return values
+    if dtype == "datetime64[s]":
+        return numpy.array([_naive_utc(v) for v in values], dtype=dtype)
+    if dtype == "bool" and None in values:
+        # a bool array cannot hold missing values
+        dtype = None
+    if dtype is None:
+        # fromiter keeps list values, like tags, as single elements
+        return numpy.fromiter(values, dtype=object, count=len(values))
+    return numpy.array(values, dtype=dtype)
+
+
+class ColumnTable:
+    # named columns of equal length; numpy arrays when numpy is installed,
+    # plain lists otherwise, so the same code runs either way
+
+    def __init__(self, columns: dict[str, list], dtypes: dict[str, str] = None):
+        dtypes = dtypes or {}
+        self.columns = {
+            name: _column(list(values), dtypes.get(name))
+            for name, values in columns.items()
+        }
+
+    @classmethod
+    def _wrap(cls, columns: dict) -> "ColumnTable":
+        table = cls.__new__(cls)
+        table.columns = columns
+        return table
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return self.columns[key]
+        return self.filter(key)
+
+    def __len__(self):
+        return len(next(iter(self.columns.values()), ()))
+
+    def __repr__(self):
+        return f"<ColumnTable {len(self)} rows x {list(self.columns)}>"
+
+    def eq(self, name: str, value):
+        column = self.columns[name]
+        if numpy is not None:
+            return column == value
+        return [v == value for v in column]
+
+    def filter(self, mask: Iterable[bool]) -> "ColumnTable":
+        if numpy is not None:
+            mask = numpy.asarray(mask, dtype=bool)
+            return self._wrap({n: c[mask] for n, c in self.columns.items()})
+        mask = list(mask)
+        return self._wrap(
+            {n: [v for v, m in zip(c, mask) if m] for n, c in self.columns.items()}
+        )
+
+    def isin(self, name: str, values: Iterable):
+        column = self.columns[name]
+        values = set(values)
+        if numpy is not None and column.dtype != object:
+            return numpy.isin(column, list(values))
+        mask = [v in values for v in column]
+        return mask if numpy is None else numpy.array(mask, dtype=bool)
+
+    def rows(self) -> Iterable[tuple]:
+        return zip(*(self.values(n) for n in self.columns))
+
+    def to_csv(self, f: TextIO, header: list[str] = None):
+        writer = csv.writer(f)
+        writer.writerow(header or list(self.columns))
+        writer.writerows(self.rows())
+
+    def to_pandas(self):
+        import pandas
+
+        return pandas.DataFrame(self.columns)
+
+    def to_parquet(self, path):
+        import pyarrow
+        import pyarrow.parquet
+
+        arrays = [pyarrow.array(self.values(n)) for n in self.columns]
+        pyarrow.parquet.write_table(
+            pyarrow.Table.from_arrays(arrays, names=list(self.columns)), path
+        )
+
+    def values(self, name: str) -> list:
+        # python values, with NaT and other missing values as None
+        column = self.columns[name]
+        if numpy is None:
+            return column
+        values = column.tolist()
+        if column.dtype.kind == "M":
+            return [
+                None if v is None else v.replace(tzinfo=datetime.UTC) for v in values
+            ]
+        return values
@@ -0,0 +1,63 @@
+import threading
+import fake_zendesk
+import pytest
+import zendesk
+
+
+@pytest.fixture
+def fake():
+    fake = fake_zendesk.FakeZendesk(users=300)
+    server = fake_zendesk.make_server(fake)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    fake.url = f"http://127.0.0.1:{server.server_port}"
+    yield fake
+    server.shutdown()
+
+
+@pytest.fixture
+def client(fake):
+    return zendesk.ZendeskClient(fake.url, "u", "p", job_poll_interval=0)
+
+
+def test_batch_sends_changes_in_bulk(fake, client):
+    with client.batch() as batch:
+        client.users[1].external_id = "Y"
+        client.organizations[0].name = "Renamed"
+    assert batch.failures == []
+    assert fake.user(1)["external_id"] == "Y"
+    assert fake.organization(0)["name"] == "Renamed"
+
+
+def test_records_are_restored_when_the_block_raises(fake, client):
+    user = client.users[1]
+    org = client.organizations[0]
+    with pytest.raises(RuntimeError):
+        with client.batch():
+            user.external_id = "Y"
+            user.external_id = "Z"
+            org.name = "Renamed"
+            raise RuntimeError
+    assert user.external_id == "E0000001"
+    assert org.name == "Org 0"
+    assert client.get_organization_by_name("Org 0") is org
+    assert client.get_organization_by_name("Renamed") is None
+    assert fake.user(1)["external_id"] == "E0000001"
+    assert not any(e.startswith("PUT") for e in client.metrics.to_dict())
+
+
+def test_failed_jobs_are_failures(fake, client, monkeypatch):
+    job = fake.job
+
+    def failed_job(results):
+        data = job(results)
+        data["job_status"].update(status="failed", results=None, message="Boom")
+        return data
+
+    monkeypatch.setattr(fake, "job", failed_job)
+    with client.batch() as batch:
+        client.users[1].external_id = "Y"
+        client.users[2].external_id = "Z"
+    assert sorted(f["id"] for f in batch.failures) == [2, 3]
+    failure = batch.result("users", 2)
+    assert failure["error"] == "JobFailed"
+    assert "failed: Boom" in failure["details"]
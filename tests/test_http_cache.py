@@ -0,0 +1,83 @@
+import threading
+import fake_zendesk
+import http_cache
+import pytest
+import zendesk
+
+
+@pytest.fixture
+def servers():
+    started = []
+
+    def start(groups: int) -> tuple[fake_zendesk.FakeZendesk, str]:
+        fake = fake_zendesk.FakeZendesk(users=100, groups=groups)
+        server = fake_zendesk.make_server(fake)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        started.append(server)
+        return fake, f"http://127.0.0.1:{server.server_port}"
+
+    yield start
+    for server in started:
+        server.shutdown()
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = http_cache.HttpCache(tmp_path / "cache.sqlite")
+    yield cache
+    cache.close()
+
+
+def test_key_includes_host_and_user():
+    key = http_cache.HttpCache.key
+    url = "https://a.zendesk.com/api/v2/groups.json?page[size]=100"
+    assert key(url) != key(url.replace("//a.", "//b."))
+    assert key(url) != key(url.replace("https:", "http:"))
+    assert key(url, username="x@a.com") != key(url, username="y@a.com")
+    assert key(url) == key(
+        "https://a.zendesk.com/api/v2/groups.json", {"page[size]": 100}
+    )
+
+
+def test_clients_sharing_a_cache_read_their_own_responses(servers, cache):
+    _, first_url = servers(2)
+    _, second_url = servers(3)
+    first = zendesk.ZendeskClient(first_url, "u", "p", cache=cache)
+    second = zendesk.ZendeskClient(second_url, "u", "p", cache=cache)
+    assert len(first.groups) == 2
+    assert len(second.groups) == 3
+
+
+def test_users_sharing_a_cache_read_their_own_responses(servers, cache):
+    fake, url = servers(2)
+    first = zendesk.ZendeskClient(url, "first", "p", cache=cache)
+    first.groups
+    requests_before = fake.request_count
+    zendesk.ZendeskClient(url, "first", "p", cache=cache).groups
+    assert fake.request_count == requests_before
+    zendesk.ZendeskClient(url, "second", "p", cache=cache).groups
+    assert fake.request_count > requests_before
+
+
+def test_writes_drop_cached_pages_of_their_collection(servers, cache):
+    fake, url = servers(2)
+    first = zendesk.ZendeskClient(url, "first", "p", cache=cache)
+    second = zendesk.ZendeskClient(url, "second", "p", cache=cache)
+    second.organizations
+    second.groups
+    first.update_organization(1, {"name": "Renamed"})
+    requests_before = fake.request_count
+    second = zendesk.ZendeskClient(url, "second", "p", cache=cache)
+    assert second.get_organization_by_name("Renamed").id == 1
+    second.groups
+    # the organizations page was fetched again, groups came from the cache
+    assert fake.request_count == requests_before + 1
+
+
+def test_bulk_writes_drop_cached_pages(servers, cache):
+    _, url = servers(2)
+    client = zendesk.ZendeskClient(url, "u", "p", cache=cache)
+    client.organizations
+    client.wait_for_jobs(client.update_organizations_many({1: {"name": "Bulk"}}))
+    client.clear_cache()
+    assert client.get_organization_by_name("Bulk").id == 1
@@ -0,0 +1,66 @@
+import threading
+import fake_zendesk
+import pytest
+import requests
+import zendesk
+
+
+@pytest.fixture
+def fake():
+    fake = fake_zendesk.FakeZendesk(users=100, tickets=1000, job_polls=2, max_jobs=5)
+    server = fake_zendesk.make_server(fake)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    fake.url = f"http://127.0.0.1:{server.server_port}"
+    yield fake
+    server.shutdown()
+
+
+@pytest.fixture
+def client(fake):
+    return zendesk.ZendeskClient(
+        fake.url, "u", "p", max_jobs=fake.max_jobs, job_poll_interval=0
+    )
+
+
+def changes(count: int) -> dict[int, dict]:
+    # distinct changes go out as per-record updates, 100 records per job
+    return {t: {"subject": f"New {t}"} for t in range(1, count + 1)}
+
+
+def test_jobs_in_flight_are_capped(fake, client):
+    jobs = client.update_tickets_many(changes(1000))
+    assert len(jobs) == 10
+    assert fake.max_queued_jobs == fake.max_jobs
+    jobs = client.wait_for_jobs(jobs)
+    assert all(job.status == "completed" for job in jobs)
+    assert sum(len(job.results) for job in jobs) == 1000
+    assert fake.ticket(999)["subject"] == "New 1000"
+    assert (
+        client.metrics.to_dict()["PUT /tickets/update_many.json"]["rate_limited"] == 0
+    )
+
+
+def test_jobs_are_polled_together(client):
+    jobs = client.wait_for_jobs(client.update_tickets_many(changes(300)))
+    assert [len(job.results) for job in jobs] == [100, 100, 100]
+    endpoints = client.metrics.to_dict()
+    assert endpoints["GET /job_statuses/show_many.json"]["count"] == 2
+    assert not any(e.startswith("GET /job_statuses/job") for e in endpoints)
+
+
+def test_failed_batch_keeps_submitted_jobs(client, monkeypatch):
+    put = client._put
+    calls = []
+
+    def failing_put(url, json):
+        calls.append(url)
+        if len(calls) == 3:
+            raise requests.exceptions.HTTPError("500 Server Error")
+        return put(url, json)
+
+    monkeypatch.setattr(client, "_put", failing_put)
+    with pytest.raises(zendesk.ZendeskJobsError) as e:
+        client.update_tickets_many(changes(500))
+    assert len(e.value.jobs) == 2
+    jobs = client.wait_for_jobs(e.value.jobs)
+    assert sum(len(job.results) for job in jobs) == 200
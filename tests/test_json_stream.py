@@ -0,0 +1,48 @@
+import json
+import pytest
+import zendesk
+
+DOCUMENTS = [
+    {"tickets": [1.5e10, 2]},
+    {"tickets": [1, -2, 3.25, -4.5e-3, 6e7, 0, 10, 1234567890]},
+    {"count": 12345, "tickets": [{"id": 1, "n": -0.5}, {"id": 22}], "next": None},
+    {"tickets": [], "end_of_stream": True, "after_cursor": "abc"},
+    {"tickets": [True, False, None, "1.5", {"a": [1, [2, 3]]}], "z": 1e-5},
+    {"before": [1, 2], "tickets": ["café", "☃ snow", "\\"], "after": 98.6},
+    {},
+]
+
+
+def chunked(data: bytes, size: int):
+    return [data[i : i + size] for i in range(0, len(data), size)]
+
+
+def collect(chunks, key: str = "tickets"):
+    elements = []
+    stream = zendesk._iter_json_array(chunks, key)
+    while True:
+        try:
+            elements.append(next(stream))
+        except StopIteration as e:
+            return elements, e.value
+
+
+@pytest.mark.parametrize("document", DOCUMENTS)
+@pytest.mark.parametrize("separators", [(",", ":"), (", ", ": ")])
+def test_every_chunk_size(document, separators):
+    data = json.dumps(document, separators=separators, ensure_ascii=False).encode()
+    rest = {k: v for k, v in document.items() if k != "tickets"}
+    for size in range(1, len(data) + 1):
+        elements, remainder = collect(chunked(data, size))
+        assert elements == document.get("tickets", []), size
+        assert remainder == rest, size
+
+
+def test_number_split_across_chunks():
+    elements, _ = collect([b'{"tickets": [1', b".5e10, 2]}"])
+    assert elements == [1.5e10, 2]
+
+
+def test_truncated_document():
+    with pytest.raises(ValueError):
+        collect([b'{"tickets": [1, 2'])
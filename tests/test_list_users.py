@@ -0,0 +1,50 @@
+import threading
+import fake_zendesk
+import pytest
+import zendesk
+
+
+@pytest.fixture
+def fake():
+    fake = fake_zendesk.FakeZendesk(users=250)
+    server = fake_zendesk.make_server(fake)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    fake.url = f"http://127.0.0.1:{server.server_port}"
+    yield fake
+    server.shutdown()
+
+
+def test_sideloaded_emails_make_no_requests(fake):
+    z = zendesk.ZendeskClient(fake.url, "u", "p")
+    users = list(z.list_users())
+    requests_before = fake.request_count
+    emails = [u.emails for u in users]
+    assert fake.request_count == requests_before
+    assert len(users) == 250
+    assert emails[7] == ["user7@example.com"]
+
+
+def test_sideloaded_organizations_and_groups(fake):
+    z = zendesk.ZendeskClient(fake.url, "u", "p")
+    include = ("identities", "organizations", "groups")
+    users = {u.id: u for u in z.list_users(include)}
+    requests_before = fake.request_count
+    assert [o.name for o in users[1].organizations] == ["Org 0", "Org 1"]
+    assert [g.name for g in users[1].groups] == ["Group 0"]
+    assert [o.name for o in users[2].organizations] == ["Org 1"]
+    assert users[2].groups == []
+    assert fake.request_count == requests_before
+
+
+def test_sideloaded_records_use_projections(fake):
+    projections = {
+        zendesk.ZendeskOrganization: ("name",),
+        zendesk.ZendeskUserIdentity: ("type", "value"),
+    }
+    z = zendesk.ZendeskClient(fake.url, "u", "p", projections=projections)
+    user = next(z.list_users(("identities", "organizations")))
+    (org,) = user.organizations[:1]
+    assert isinstance(org, zendesk.ZendeskRecord)
+    assert org.name == "Org 0"
+    assert "tags" not in org
+    assert user.emails == ["user0@example.com"]
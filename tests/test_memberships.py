@@ -0,0 +1,61 @@
+import threading
+import fake_zendesk
+import pytest
+import zendesk
+
+
+@pytest.fixture
+def client():
+    # 1000 users in 10 organizations; user u is in organization (u - 1) % 10
+    # + 1, and every tenth user from user 1 is in a second organization
+    fake = fake_zendesk.FakeZendesk(users=1000)
+    server = fake_zendesk.make_server(fake)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield zendesk.ZendeskClient(f"http://127.0.0.1:{server.server_port}", "u", "p")
+    server.shutdown()
+
+
+def current(client, user_id: int) -> set[int]:
+    return {m.organization_id for m in client.list_org_memberships_for_user(user_id)}
+
+
+def requests_to(client, endpoint: str) -> int:
+    return sum(
+        m["count"]
+        for name, m in client.metrics.to_dict().items()
+        if name.endswith(endpoint)
+    )
+
+
+def test_diff_against_cached_memberships(client):
+    assert current(client, 1) == {1, 2}
+    assert current(client, 3) == {3}
+    to_create, to_destroy = client.diff_organization_memberships(
+        {1: {2, 5}, 2: {2}, 3: set()}
+    )
+    assert to_create == [{"user_id": 1, "organization_id": 5}]
+    assert to_destroy == [1, 3]
+
+
+def test_unchanged_users_make_no_jobs(client):
+    desired = {user_id: current(client, user_id) for user_id in range(1, 101)}
+    assert client.diff_organization_memberships(desired) == ([], [])
+    assert client.sync_organization_memberships(desired) == []
+    assert requests_to(client, "/organization_memberships/create_many.json") == 0
+    assert requests_to(client, "/organization_memberships/destroy_many.json") == 0
+
+
+def test_sync_batches_100_memberships_per_job(client):
+    # users 1 to 250 move to organization 10, so 250 memberships are created
+    # and those outside organization 10, with the second memberships of
+    # every tenth user, are removed
+    desired = {user_id: {10} for user_id in range(1, 251)}
+    to_create, to_destroy = client.diff_organization_memberships(desired)
+    assert len(to_create) == 250 - 25
+    assert len(to_destroy) == 250 - 25 + 25
+    jobs = client.wait_for_jobs(client.sync_organization_memberships(desired))
+    assert [len(job.results) for job in jobs] == [100, 100, 25, 100, 100, 50]
+    assert requests_to(client, "/organization_memberships/create_many.json") == 3
+    assert requests_to(client, "/organization_memberships/destroy_many.json") == 3
+    # the memberships are fetched again after a sync
+    assert client._organization_memberships is None
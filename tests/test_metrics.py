@@ -0,0 +1,80 @@
+import gzip
+import http.server
+import json
+import metrics
+import threading
+import pytest
+import zendesk
+
+DATA = json.dumps({"groups": [{"id": 1, "name": "x" * 500}]}).encode()
+BODY = gzip.compress(DATA)
+
+
+class Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    failures = 0
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if Handler.failures > 0:
+            Handler.failures -= 1
+            self.send_response(503)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Encoding", "gzip")
+        if "stream" not in self.path:
+            self.send_header("Content-Length", str(len(BODY)))
+            self.end_headers()
+            self.wfile.write(BODY)
+            return
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        self.wfile.write(f"{len(BODY):x}\r\n".encode() + BODY + b"\r\n0\r\n\r\n")
+
+
+@pytest.fixture
+def client():
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}"
+    yield zendesk.ZendeskClient(url, "u", "p", backoff_factor=0, backoff_jitter=0)
+    server.shutdown()
+
+
+def test_adapter_retries_are_counted(client):
+    Handler.failures = 2
+    client._get(f"{client.base_url}/groups.json")
+    m = client.metrics.to_dict()["GET /groups.json"]
+    assert m["count"] == 1
+    assert m["retries"] == 2
+
+
+def test_bytes_are_decompressed_body_bytes(client):
+    Handler.failures = 0
+    client._get(f"{client.base_url}/groups.json")
+    list(client._get_stream(f"{client.base_url}/stream.json", None, "groups"))
+    metrics = client.metrics.to_dict()
+    assert metrics["GET /groups.json"]["bytes"] == len(DATA)
+    assert metrics["GET /stream.json"]["bytes"] == len(DATA)
+
+
+@pytest.mark.parametrize(
+    "path, template",
+    [
+        ("/api/v2/users/123/identities.json", "/users/{id}/identities.json"),
+        ("/api/v2/users/show_many.json", "/users/show_many.json"),
+        (
+            "/api/v2/job_statuses/8b726e606741012ffc2d782bcb7848fe.json",
+            "/job_statuses/{id}.json",
+        ),
+        ("/api/v2/job_statuses/show_many.json", "/job_statuses/show_many.json"),
+        ("/api/v2/incremental/tickets/cursor.json", "/incremental/tickets/cursor.json"),
+    ],
+)
+def test_endpoint_template(path, template):
+    assert metrics.endpoint_template(path) == template
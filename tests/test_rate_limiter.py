@@ -0,0 +1,23 @@
+import requests
+import zendesk
+
+
+def response(headers: dict) -> requests.Response:
+    r = requests.Response()
+    r.status_code = 200
+    r.headers.update(headers)
+    return r
+
+
+def test_share_splits_the_account_limit():
+    limiter = zendesk.RateLimiter(share=0.25)
+    limiter.update("/tickets.json", response({"X-Rate-Limit": "400"}))
+    assert limiter.capacity == 400 * 0.9 * 0.25
+    assert limiter.rate == limiter.capacity / 60
+
+
+def test_share_of_remaining_budget():
+    limiter = zendesk.RateLimiter(400, share=0.5)
+    limiter.update("/tickets.json", response({"X-Rate-Limit-Remaining": "140"}))
+    # 40 requests are held back as headroom, half of the rest is ours
+    assert limiter.tokens == 50
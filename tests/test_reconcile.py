@@ -0,0 +1,87 @@
+import pytest
+import reconcile
+
+ZENDESK = [
+    {"Email": "A@x.com", "External ID": "1", "Organization": "Sales"},
+    {"Email": "b@x.com", "External ID": "2", "Organization": "Support"},
+    {"Email": "old-c@x.com", "External ID": "3", "Organization": "Sales"},
+    {"Email": "d@x.com", "External ID": "", "Organization": "Sales"},
+]
+WORKDAY = [
+    {"Email Address": "a@x.com other@x.com", "Employee ID": "1", "Dept": "Sales"},
+    {"Email Address": "b@x.com", "Employee ID": "2", "Dept": "Presales"},
+    {"Email Address": "c@x.com", "Employee ID": " 3 ", "Dept": "sales"},
+    {"Email Address": "e@x.com", "Employee ID": "5", "Dept": "Sales"},
+]
+
+
+def zendesk_key(row: dict) -> tuple[str, str]:
+    return (
+        reconcile.normalize_email(row.get("Email")),
+        reconcile.normalize_id(row.get("External ID")),
+    )
+
+
+def workday_key(row: dict) -> tuple[str, str]:
+    return (
+        reconcile.normalize_email(row.get("Email Address")),
+        reconcile.normalize_id(row.get("Employee ID")),
+    )
+
+
+def diffs(left=ZENDESK, right=WORKDAY, **kwargs) -> list[tuple]:
+    result = reconcile.reconcile(left, right, zendesk_key, workday_key, **kwargs)
+    return sorted(
+        (
+            d.status,
+            (d.left or {}).get("Email"),
+            (d.right or {}).get("Email Address"),
+            d.fields,
+        )
+        for d in result
+    )
+
+
+def test_left_only_and_right_only():
+    result = diffs()
+    assert ("left_only", "d@x.com", None, ()) in result
+    assert ("right_only", None, "e@x.com", ()) in result
+
+
+def test_email_miss_falls_back_to_id():
+    assert ("mismatch", "old-c@x.com", "c@x.com", ("email",)) in diffs()
+
+
+def test_matches_are_only_written_when_asked():
+    assert ("match", "A@x.com", "a@x.com other@x.com", ()) not in diffs()
+    result = diffs(include_matches=True)
+    assert ("match", "A@x.com", "a@x.com other@x.com", ()) in result
+
+
+def test_duplicate_emails_on_the_build_side():
+    workday = [
+        {"Email Address": "a@x.com", "Employee ID": "1"},
+        {"Email Address": "a@x.com", "Employee ID": "9"},
+    ]
+    result = diffs(ZENDESK[:1], workday, build="right", include_matches=True)
+    assert result == [
+        ("match", "A@x.com", "a@x.com", ()),
+        ("right_only", None, "a@x.com", ()),
+    ]
+
+
+def test_compare_mismatches():
+    compare = {"org": ("Organization", "Dept")}
+    result = diffs(compare=compare)
+    assert ("mismatch", "b@x.com", "b@x.com", ("org",)) in result
+    # values are compared without case or extra spaces
+    assert ("mismatch", "old-c@x.com", "c@x.com", ("email",)) in result
+
+
+@pytest.mark.parametrize("include_matches", [False, True])
+def test_build_side_does_not_change_the_diffs(include_matches):
+    compare = {"org": ("Organization", "Dept")}
+    left = diffs(build="left", compare=compare, include_matches=include_matches)
+    right = diffs(build="right", compare=compare, include_matches=include_matches)
+    assert left == right
+    assert len(left) == (5 if include_matches else 4)
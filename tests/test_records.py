@@ -0,0 +1,43 @@
+import json
+import pytest
+import zendesk
+
+
+@pytest.fixture
+def user():
+    model = zendesk.compact_model(zendesk.ZendeskUser, ("email", "name", "role"))
+    data = {"id": 7, "email": "a@example.com", "name": "Ann", "active": True}
+    return model(None, data)
+
+
+def test_properties(user):
+    assert user.id == 7
+    assert user.email == "a@example.com"
+    assert user.name == "Ann"
+    assert str(user) == "Ann"
+    assert user.role is None
+
+
+def test_fields_outside_the_projection(user):
+    with pytest.raises(KeyError):
+        user.get("active")
+    assert "active" not in user
+
+
+def test_dict_protocol(user):
+    expected = {"id": 7, "email": "a@example.com", "name": "Ann"}
+    assert list(user) == ["id", "email", "name"]
+    assert len(user) == 3
+    assert dict(user) == expected
+    assert user.items() == list(expected.items())
+    assert user.values() == list(expected.values())
+    assert json.loads(json.dumps(dict(user))) == expected
+    assert user["email"] == "a@example.com"
+    with pytest.raises(KeyError):
+        user["role"]
+
+
+def test_update(user):
+    user.update({"role": "agent", "active": False})
+    assert user.role == "agent"
+    assert len(user) == 4
@@ -0,0 +1,62 @@
+import datetime
+import io
+import pytest
+import table
+
+COLUMNS = {
+    "id": [1, 2, 3],
+    "active": [True, None, False],
+    "last_login_at": ["2020-01-01T00:00:00Z", None, "2021-05-06T07:08:09Z"],
+    "tags": [["a"], [], ["b", "c"]],
+}
+DTYPES = {"id": "int64", "active": "bool", "last_login_at": "datetime64[s]"}
+CSV = (
+    "id,active,last_login_at,tags\r\n"
+    "1,True,2020-01-01 00:00:00+00:00,['a']\r\n"
+    "2,,,[]\r\n"
+    "3,False,2021-05-06 07:08:09+00:00,\"['b', 'c']\"\r\n"
+)
+
+
+@pytest.fixture(params=["lists", "numpy"])
+def users(request, monkeypatch):
+    if request.param == "numpy":
+        pytest.importorskip("numpy")
+    else:
+        monkeypatch.setattr(table, "numpy", None)
+    return table.ColumnTable(COLUMNS, DTYPES)
+
+
+def test_missing_values_stay_none(users):
+    assert users.values("active") == [True, None, False]
+    assert users.values("last_login_at")[1] is None
+
+
+def test_datetimes_are_tz_aware(users):
+    assert users.values("last_login_at")[2] == datetime.datetime(
+        2021, 5, 6, 7, 8, 9, tzinfo=datetime.UTC
+    )
+
+
+def test_to_csv(users):
+    f = io.StringIO()
+    users.to_csv(f)
+    assert f.getvalue() == CSV
+
+
+def test_filter(users):
+    active = users[users.eq("active", True)]
+    assert active.values("id") == [1]
+    assert users[users.isin("id", [2, 3])].values("tags") == [[], ["b", "c"]]
+    assert len(users) == 3
+
+
+def test_numpy_columns():
+    numpy = pytest.importorskip("numpy")
+    assert table.numpy is numpy
+    users = table.ColumnTable(COLUMNS, DTYPES)
+    assert users["id"].dtype == numpy.int64
+    assert users["last_login_at"].dtype == numpy.dtype("datetime64[s]")
+    assert numpy.isnat(users["last_login_at"][1])
+    assert users["tags"].dtype == object
+    assert table.ColumnTable({"a": [True, False]}, {"a": "bool"})["a"].dtype == bool
@@ -1,14 +1,19 @@
+import logging
 import notch
 import os
 import zendesk
 
 notch.configure()
+log = logging.getLogger(__name__)
 
 company = os.getenv("ZENDESK_COMPANY")
 username = os.getenv("ZENDESK_USERNAME")
 password = os.getenv("ZENDESK_PASSWORD")
 z = zendesk.ZendeskClient(company, username, password)
 
-for user in z.users:
-    if user.role == "agent" and user.restricted_agent:
-        user.ticket_restriction = None
+with z.batch() as batch:
+    for user in z.users:
+        if user.role == "agent" and user.restricted_agent:
+            user.ticket_restriction = None
+for failure in batch.failures:
+    log.error(f"Could not update agent {failure.get('id')}: {failure}")
@@ -1,6 +1,7 @@
 import csv
 import logging
 import settings
+import snapshot
 import sys
 import zendesk
 
@@ -24,9 +25,12 @@ def main():
 
     log.info(f"Reading external_ids from {s.external_id_file}")
     external_ids = get_external_ids(s)
-    z = zendesk.ZendeskClient(s.zendesk_company, s.zendesk_username, s.zendesk_password)
+    z = zendesk.ZendeskClient.from_settings(s)
+    if s.snapshot_file is not None:
+        snapshot.ZendeskSnapshot(s.snapshot_file).attach(z)
 
-    for user in z.users:
+    changes = {}
+    for user in z.iter_users():
         if user.suspended:
             log.info(f"{user.id} ({user.name}) is suspended")
             continue
@@ -36,7 +40,7 @@ def main():
                 log.warning(
                     f"{user.id} ({user.name}) setting external_id to {external_id}"
                 )
-                user.external_id = external_id
+                changes[user.id] = {"external_id": external_id}
             else:
                 log.warning(
                     f"{user.id} ({user.name}) could not find external_id for {user.email}"
@@ -46,6 +50,16 @@ def main():
                 f"{user.id} ({user.name}) already has external_id: {user.external_id}"
             )
 
+    try:
+        jobs = z.update_users_many(changes)
+        log.info(f"Submitted {len(changes)} external_id changes in {len(jobs)} jobs")
+    except zendesk.ZendeskJobsError as e:
+        log.error(e)
+        jobs = e.jobs
+    for job in z.wait_for_jobs(jobs):
+        for r in job.failures:
+            log.error(f"{r.get('id')}: {r.get('error')} {r.get('details')}")
+
 
 if __name__ == "__main__":
     main()
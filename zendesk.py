@@ -1,51 +1,528 @@
+import asyncio
+import codecs
+import collections
+import concurrent.futures
+import contextlib
 import datetime
+import functools
+import http_cache
+import json
 import logging
+import metrics
+import operator
+import pathlib
 import requests
+import requests.adapters
 import requests.auth
+import table
+import threading
+import time
+import urllib.parse
+import urllib3.util
 
-from typing import Optional
+from typing import Iterable, Optional
 
 log = logging.getLogger(__name__)
 
 
+class RateLimiter:
+    # token bucket refilled at the account limit reported by X-Rate-Limit,
+    # scaled by headroom so that we stay just under it; share is the part of
+    # the account budget this limiter may use when several processes run
+    def __init__(
+        self, rate_per_minute: int = 200, headroom: float = 0.9, share: float = 1.0
+    ):
+        self.headroom = headroom
+        self.share = share
+        self.lock = threading.Lock()
+        self.blocked_until = 0.0
+        self.endpoint_blocked_until = {}
+        self.set_limit(rate_per_minute)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, endpoint: str = None):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self._refill(now)
+                blocked_until = max(
+                    self.blocked_until, self.endpoint_blocked_until.get(endpoint, 0.0)
+                )
+                wait = blocked_until - now
+                if wait <= 0 and self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = max(wait, (1 - self.tokens) / self.rate)
+            log.debug(f"Rate limit reached, waiting {wait:.2f} seconds")
+            time.sleep(wait)
+
+    def set_limit(self, rate_per_minute: int):
+        self.limit = rate_per_minute
+        self.capacity = max(1.0, rate_per_minute * self.headroom * self.share)
+        self.rate = self.capacity / 60
+
+    def update(self, endpoint: str, response: requests.Response):
+        headers = response.headers
+        with self.lock:
+            now = time.monotonic()
+            self._refill(now)
+            limit = headers.get("X-Rate-Limit")
+            if limit is not None and int(limit) != self.limit:
+                log.debug(f"Account rate limit is {limit} requests per minute")
+                self.set_limit(int(limit))
+            remaining = headers.get("X-Rate-Limit-Remaining")
+            if remaining is not None:
+                # leave the headroom share of the account budget unused
+                spare = int(remaining) - self.limit * (1 - self.headroom)
+                self.tokens = min(self.tokens, max(0.0, spare * self.share))
+            if headers.get("ratelimit-remaining") == "0":
+                reset = float(headers.get("ratelimit-reset", 60))
+                self.endpoint_blocked_until[endpoint] = now + reset
+            if response.status_code == 429:
+                retry_after = float(headers.get("Retry-After", 60))
+                log.warning(f"Rate limited on {endpoint}, retrying in {retry_after}s")
+                self.blocked_until = max(self.blocked_until, now + retry_after)
+                self.tokens = 0.0
+
+
+class ZendeskJobsError(requests.exceptions.HTTPError):
+    # a bulk request failed; jobs are the ones submitted before it, which
+    # still run on the server and should be waited for and reported
+    def __init__(self, error: requests.exceptions.HTTPError, jobs: list):
+        super().__init__(str(error), request=error.request, response=error.response)
+        self.jobs = jobs
+
+
+class ZendeskBatch:
+    # mutations made through the model setters while a batch is open; changes
+    # to the same record are merged and sent through the update_many
+    # endpoints when the batch is flushed
+    resources = {
+        "organizations": "organization",
+        "tickets": "ticket",
+        "users": "user",
+    }
+
+    def __init__(self, client: "ZendeskClient"):
+        self.client = client
+        self.changes = {resource: {} for resource in self.resources}
+        self.results = {resource: {} for resource in self.resources}
+        # (resource, id) -> (record, values before the first change), so
+        # that the setters can be undone when the block raises
+        self.originals = {}
+
+    def __len__(self):
+        return sum(len(c) for c in self.changes.values())
+
+    def add(self, resource: str, record_id: int, params: dict, record=None):
+        self.changes[resource].setdefault(record_id, {}).update(params)
+        if record is not None:
+            key = (resource, record_id)
+            original = self.originals.setdefault(key, (record, {}))[1]
+            for name in params:
+                original.setdefault(name, record.get(name))
+
+    def discard(self):
+        # nothing was sent; put the records back the way they were
+        for (resource, _), (record, original) in self.originals.items():
+            name = record.get("name")
+            record.update(original)
+            if resource == "organizations" and "name" in original:
+                self.client.reindex_organization(record, name)
+        self.changes = {resource: {} for resource in self.resources}
+        self.originals = {}
+
+    @property
+    def failures(self) -> list[dict]:
+        return [
+            {"resource": resource, **r}
+            for resource, results in self.results.items()
+            for r in results.values()
+            if not r.get("success", "error" not in r)
+        ]
+
+    def flush(self, wait: bool = True) -> list["ZendeskJobStatus"]:
+        jobs = []
+        for resource, singular in self.resources.items():
+            changes = self.changes[resource]
+            if not changes:
+                continue
+            log.info(f"Flushing changes to {len(changes)} {resource}")
+            resource_jobs = self.client._update_many(resource, singular, changes)
+            self.changes[resource] = {}
+            if wait:
+                resource_jobs = self.client.wait_for_jobs(resource_jobs)
+                for job in resource_jobs:
+                    for r in job.results:
+                        self.results[resource][r.get("id")] = r
+                self._add_failed_jobs(resource, changes, resource_jobs)
+            jobs.extend(resource_jobs)
+        return jobs
+
+    def _add_failed_jobs(self, resource: str, changes: dict, jobs: list):
+        # a failed or killed job can end without per-record results; the
+        # records it held are reported as failures of the job
+        failed = [job for job in jobs if job.status in ("failed", "killed")]
+        if not failed:
+            return
+        details = "; ".join(
+            f"job {job.id} {job.status}: {job.get('message')}" for job in failed
+        )
+        for record_id in changes:
+            self.results[resource].setdefault(
+                record_id,
+                {
+                    "id": record_id,
+                    "success": False,
+                    "error": "JobFailed",
+                    "details": details,
+                },
+            )
+
+    def result(self, resource: str, record_id: int) -> dict | None:
+        # the job result for one record, available after a waited flush
+        return self.results[resource].get(record_id)
+
+
 class ZendeskClient:
+    _batch = None
     _group_memberships = None
+    _group_memberships_by_group = None
+    _group_memberships_by_user = None
     _groups = None
+    _groups_by_id = None
+    _groups_by_name = None
     _organization_memberships = None
+    _organization_memberships_by_org = None
+    _organization_memberships_by_user = None
     _organizations = None
+    _organizations_by_id = None
+    _organizations_by_name = None
+    _ticket_fields = None
     _users = None
+    _users_by_id = None
 
-    def __init__(self, company: str, username: str, password: str):
-        self.base_url = f"https://{company}.zendesk.com/api/v2"
+    def __init__(
+        self,
+        company: str,
+        username: str,
+        password: str,
+        rate_limiter: RateLimiter = None,
+        max_retries: int = 5,
+        projections: dict[type, Iterable[str]] = None,
+        pool_connections: int = 10,
+        pool_maxsize: int = 10,
+        connect_timeout: float = 10.0,
+        read_timeout: float = 60.0,
+        transient_retries: int = 3,
+        backoff_factor: float = 0.5,
+        backoff_jitter: float = 0.5,
+        compression: bool = True,
+        request_metrics: metrics.RequestMetrics = None,
+        cache: http_cache.HttpCache = None,
+        user_cache_size: int = 10000,
+        max_jobs: int = 30,
+        job_poll_interval: float = 2.0,
+    ):
+        if company.startswith(("http://", "https://")):
+            # a full URL points the client at another server, like fake_zendesk
+            self.base_url = f"{company.rstrip('/')}/api/v2"
+        else:
+            self.base_url = f"https://{company}.zendesk.com/api/v2"
         log.debug(f"Zendesk base url is {self.base_url}")
         self.s = requests.Session()
         self.s.auth = requests.auth.HTTPBasicAuth(username, password)
         self.s.headers.update({"accept": "application/json"})
+        if compression:
+            # gzip and deflate, plus brotli and zstd when their packages exist
+            self.s.headers.update(urllib3.util.make_headers(accept_encoding=True))
+        else:
+            self.s.headers.update({"accept-encoding": "identity"})
+        # connection errors and 5xx responses to idempotent requests are
+        # retried here; 429 responses are left to the rate limiter
+        retry = urllib3.util.Retry(
+            total=transient_retries,
+            backoff_factor=backoff_factor,
+            backoff_jitter=backoff_jitter,
+            status_forcelist=(500, 502, 503, 504),
+            respect_retry_after_header=False,
+            raise_on_status=False,
+        )
+        adapter = requests.adapters.HTTPAdapter(
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            max_retries=retry,
+        )
+        self.s.mount("https://", adapter)
+        self.s.mount("http://", adapter)
+        self.timeout = (connect_timeout, read_timeout)
+        if request_metrics is None:
+            request_metrics = metrics.RequestMetrics()
+        self.metrics = request_metrics
+        if rate_limiter is None:
+            rate_limiter = RateLimiter()
+        self.rate_limiter = rate_limiter
+        self.max_retries = max_retries
+        # responses from slowly changing endpoints are kept on disk and
+        # revalidated with conditional requests
+        self.cache = cache
+        # models listed here are built as compact records that keep only the
+        # projected fields instead of the full JSON payload
+        self.models = {}
+        for model, fields in (projections or {}).items():
+            self.models[model] = compact_model(model, tuple(fields))
+        # users fetched by id while the full user list is not loaded, least
+        # recently used first
+        self.user_cache_size = user_cache_size
+        self._user_cache = collections.OrderedDict()
+        self._user_cache_lock = threading.Lock()
+        # Zendesk queues about 30 background jobs per account; bulk requests
+        # wait for one of ours to finish before going past max_jobs
+        self.max_jobs = max_jobs
+        self.job_poll_interval = job_poll_interval
+        self._jobs_in_flight = []
+
+    @classmethod
+    def from_settings(cls, s, **kwargs) -> "ZendeskClient":
+        if s.http_cache_file is not None and "cache" not in kwargs:
+            kwargs["cache"] = http_cache.HttpCache(
+                s.http_cache_file, max_bytes=s.http_cache_max_mb * 1024 * 1024
+            )
+        client = cls(
+            s.zendesk_company,
+            s.zendesk_username,
+            s.zendesk_password,
+            pool_connections=s.zendesk_pool_connections,
+            pool_maxsize=s.zendesk_pool_maxsize,
+            connect_timeout=s.zendesk_connect_timeout,
+            read_timeout=s.zendesk_read_timeout,
+            transient_retries=s.zendesk_retries,
+            backoff_factor=s.zendesk_backoff_factor,
+            backoff_jitter=s.zendesk_backoff_jitter,
+            compression=s.zendesk_compression,
+            **kwargs,
+        )
+        if s.metrics_file is not None:
+            client.metrics.export_at_exit(s.metrics_file)
+        return client
 
     def _delete(self, url: str):
         log.debug(f"DELETE {url}")
-        response = self.s.delete(url)
+        response = self._request("DELETE", url)
         response.raise_for_status()
-        # return response.json()
+        self._invalidate(url)
+        if response.content:
+            return response.json()
 
     def _get(self, url: str, params: dict = None):
+        if self.cache is not None and self.cache.ttl(url) is not None:
+            return self._get_cached(url, params)
         log.debug(f"GET {url}")
-        response = self.s.get(url, params=params)
+        response = self._request("GET", url, params=params)
+        response.raise_for_status()
+        return response.json()
+
+    def _get_cached(self, url: str, params: dict = None):
+        key = self.cache.key(url, params, self.s.auth.username)
+        entry = self.cache.get(key)
+        if entry is not None and self.cache.is_fresh(url, entry):
+            log.debug(f"GET {url} (cached)")
+            return entry.json()
+        headers = {} if entry is None else entry.conditional_headers
+        log.debug(f"GET {url} (revalidating)" if headers else f"GET {url}")
+        response = self._request("GET", url, params=params, headers=headers)
+        if response.status_code == 304 and entry is not None:
+            self.cache.touch(key)
+            return entry.json()
         response.raise_for_status()
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        if etag is not None or last_modified is not None or self.cache.ttl(url) > 0:
+            self.cache.put(key, response.content, etag, last_modified)
         return response.json()
 
+    def _invalidate(self, url: str):
+        if self.cache is not None:
+            self.cache.invalidate(url)
+
+    def _get_stream(
+        self,
+        url: str,
+        params: dict,
+        key: str,
+        model: type = None,
+        chunk_size: int = 65536,
+    ):
+        # yield the elements of the array named key as they are decoded from
+        # the response body, then return the rest of the page
+        log.debug(f"GET {url} (streaming {key})")
+        response = self._request("GET", url, params=params, stream=True)
+        response.raise_for_status()
+        endpoint = urllib.parse.urlsplit(url).path
+        nbytes = 0
+
+        def chunks():
+            nonlocal nbytes
+            for chunk in response.iter_content(chunk_size):
+                nbytes += len(chunk)
+                yield chunk
+
+        try:
+            elements = _iter_json_array(chunks(), key)
+            if model is None:
+                return (yield from elements)
+            return (yield from map(functools.partial(self.record, model), elements))
+        finally:
+            self.metrics.add_bytes("GET", endpoint, nbytes)
+            response.close()
+
+    def _iter_collection(self, resource: str, model: type, page_size: int = 100):
+        # serve the cached collection if there is one, otherwise yield records
+        # page by page while the next page is fetched on a background thread
+        cached = getattr(self, f"_{resource}")
+        if cached is not None:
+            yield from cached
+            return
+        url = f"{self.base_url}/{resource}.json"
+        params = {
+            "page[size]": page_size,
+        }
+        with concurrent.futures.ThreadPoolExecutor(1) as executor:
+            future = executor.submit(self._get, url, dict(params))
+            while future is not None:
+                data = future.result()
+                future = None
+                if data.get("meta").get("has_more"):
+                    params.update(
+                        {
+                            "page[after]": data.get("meta").get("after_cursor"),
+                        }
+                    )
+                    future = executor.submit(self._get, url, dict(params))
+                for r in data.get(resource):
+                    yield self.record(model, r)
+
     def _post(self, url: str, json: dict):
         log.debug(f"POST {url} / {json}")
-        response = self.s.post(url, json=json)
+        response = self._request("POST", url, json=json)
         response.raise_for_status()
+        self._invalidate(url)
         return response.json()
 
     def _put(self, url: str, json: dict):
         log.debug(f"PUT {url} / {json}")
-        response = self.s.put(url, json=json)
+        response = self._request("PUT", url, json=json)
         response.raise_for_status()
+        self._invalidate(url)
         return response.json()
 
+    def _update_many(
+        self, resource: str, singular: str, changes: dict[int, dict]
+    ) -> list["ZendeskJobStatus"]:
+        # records that share identical changes go out in the ids= form, the
+        # rest as a list of per-record updates, at most 100 records per job
+        _url = f"{self.base_url}/{resource}/update_many.json"
+        shared = {}
+        for record_id, params in changes.items():
+            key = json.dumps(params, sort_keys=True)
+            shared.setdefault(key, (params, []))[1].append(record_id)
+
+        def calls():
+            individual = []
+            for params, record_ids in shared.values():
+                if len(record_ids) == 1:
+                    individual.append({"id": record_ids[0], **params})
+                    continue
+                for batch in _batches(record_ids, 100):
+                    ids = ",".join(str(i) for i in batch)
+                    log.debug(f"Updating {len(batch)} {resource} with {params}")
+                    yield self._put, f"{_url}?ids={ids}", {singular: params}
+            for batch in _batches(individual, 100):
+                log.debug(f"Updating {len(batch)} {resource} individually")
+                yield self._put, _url, {resource: batch}
+
+        return self._submit_jobs(calls())
+
+    def _submit_jobs(self, calls: Iterable[tuple]) -> list["ZendeskJobStatus"]:
+        # calls are (method, url, json) requests that each start a job; when
+        # one fails, ZendeskJobsError carries the jobs that were started
+        jobs = []
+        for method, url, body in calls:
+            self._wait_for_job_slot()
+            try:
+                data = method(url) if body is None else method(url, body)
+            except requests.exceptions.HTTPError as e:
+                raise ZendeskJobsError(e, jobs) from e
+            job = ZendeskJobStatus(self, data.get("job_status"))
+            jobs.append(job)
+            if not job.done:
+                self._jobs_in_flight.append(job.id)
+        return jobs
+
+    def _wait_for_job_slot(self):
+        while len(self._jobs_in_flight) >= self.max_jobs:
+            statuses = self.get_job_statuses(self._jobs_in_flight)
+            self._jobs_in_flight = [j.id for j in statuses if not j.done]
+            if len(self._jobs_in_flight) >= self.max_jobs:
+                log.debug(f"{len(self._jobs_in_flight)} jobs are running, waiting")
+                time.sleep(self.job_poll_interval)
+
+    def _record_metrics(
+        self,
+        method: str,
+        endpoint: str,
+        response: requests.Response,
+        seconds: float,
+        retry: bool,
+        stream: bool,
+    ):
+        # bytes are the decompressed body; Content-Length would count the
+        # compressed size instead, and is missing from chunked responses.
+        # Streamed bodies are added by _get_stream once they have been read
+        headers = response.headers
+        nbytes = 0 if stream else len(response.content)
+        remaining = headers.get(
+            "ratelimit-remaining", headers.get("X-Rate-Limit-Remaining")
+        )
+        retries = getattr(response.raw, "retries", None)
+        self.metrics.record(
+            method,
+            endpoint,
+            response.status_code,
+            seconds,
+            nbytes,
+            retry,
+            None if remaining is None else int(remaining),
+            0 if retries is None else len(retries.history),
+        )
+
+    def _request(self, method: str, url: str, **kwargs) -> requests.Response:
+        endpoint = urllib.parse.urlsplit(url).path
+        for attempt in range(self.max_retries + 1):
+            self.rate_limiter.acquire(endpoint)
+            start = time.monotonic()
+            try:
+                response = self.s.request(method, url, timeout=self.timeout, **kwargs)
+            except requests.exceptions.RequestException:
+                seconds = time.monotonic() - start
+                self.metrics.record(method, endpoint, None, seconds, retry=attempt > 0)
+                raise
+            self.rate_limiter.update(endpoint, response)
+            seconds = time.monotonic() - start
+            stream = kwargs.get("stream", False)
+            self._record_metrics(
+                method, endpoint, response, seconds, attempt > 0, stream
+            )
+            if response.status_code != 429:
+                return response
+            response.close()
+        return response
+
     def create_organization_membership(self, user_id: int, organization_id: int):
         url = f"{self.base_url}/organization_memberships.json"
         json = {
@@ -56,45 +533,218 @@ class ZendeskClient:
         }
         return self._post(url, json)
 
+    def create_organization_memberships_many(
+        self, memberships: list[dict]
+    ) -> list["ZendeskJobStatus"]:
+        _url = f"{self.base_url}/organization_memberships/create_many.json"
+
+        def calls():
+            for batch in _batches(memberships, 100):
+                log.debug(f"Creating {len(batch)} organization memberships")
+                yield self._post, _url, {"organization_memberships": batch}
+
+        return self._submit_jobs(calls())
+
+    def create_or_update_users_many(
+        self, users: list[dict]
+    ) -> list["ZendeskJobStatus"]:
+        _url = f"{self.base_url}/users/create_or_update_many.json"
+
+        def calls():
+            for batch in _batches(users, 100):
+                log.debug(f"Creating or updating {len(batch)} users")
+                yield self._post, _url, {"users": batch}
+
+        return self._submit_jobs(calls())
+
+    @contextlib.contextmanager
+    def batch(self, wait: bool = True):
+        # setters called inside the block are recorded instead of sent, and
+        # flushed as bulk updates when the block exits without an error; if
+        # it raises, nothing is sent and the records get their old values
+        if self._batch is not None:
+            yield self._batch
+            return
+        self._batch = ZendeskBatch(self)
+        try:
+            yield self._batch
+        except BaseException:
+            self._batch.discard()
+            raise
+        else:
+            self._batch.flush(wait)
+        finally:
+            self._batch = None
+
+    def clear_cache(self):
+        self._group_memberships = None
+        self._group_memberships_by_group = None
+        self._group_memberships_by_user = None
+        self._groups = None
+        self._groups_by_id = None
+        self._groups_by_name = None
+        self._organization_memberships = None
+        self._organization_memberships_by_org = None
+        self._organization_memberships_by_user = None
+        self._organizations = None
+        self._organizations_by_id = None
+        self._organizations_by_name = None
+        self._ticket_fields = None
+        self._users = None
+        self._users_by_id = None
+        with self._user_cache_lock:
+            self._user_cache.clear()
+
+    def destroy_organization_memberships_many(
+        self, membership_ids: list[int]
+    ) -> list["ZendeskJobStatus"]:
+        _url = f"{self.base_url}/organization_memberships/destroy_many.json"
+
+        def calls():
+            for batch in _batches(membership_ids, 100):
+                log.debug(f"Deleting {len(batch)} organization memberships")
+                ids = ",".join(str(i) for i in batch)
+                yield self._delete, f"{_url}?ids={ids}", None
+
+        return self._submit_jobs(calls())
+
+    def diff_organization_memberships(
+        self, desired: dict[int, set[int]]
+    ) -> tuple[list[dict], list[int]]:
+        # compare the desired organization ids for each user with the current
+        # memberships, return the memberships to create and the ids to delete
+        to_create = []
+        to_destroy = []
+        for user_id, org_ids in desired.items():
+            current = {
+                m.organization_id: m.id
+                for m in self.list_org_memberships_for_user(user_id)
+            }
+            for org_id in sorted(org_ids - current.keys()):
+                to_create.append({"user_id": user_id, "organization_id": org_id})
+            for org_id in sorted(current.keys() - org_ids):
+                to_destroy.append(current[org_id])
+        return to_create, to_destroy
+
     def get_group_by_id(self, group_id: int) -> Optional["ZendeskGroup"]:
-        for group in self.groups:
-            if group.id == group_id:
-                return group
-        return None
+        return self.groups_by_id.get(group_id)
 
     def get_group_by_name(self, group_name: str) -> Optional["ZendeskGroup"]:
-        for group in self.groups:
-            if group.name == group_name:
-                return group
-        return None
+        if group_name is None:
+            return None
+        return self.groups_by_name.get(group_name.casefold())
 
-    def get_incremental_tickets(self, start_time: int):
+    def get_incremental_pages(
+        self,
+        resource: str,
+        start_time: int = 0,
+        cursor: str = None,
+        per_page: int = 1000,
+    ):
+        # yields (page, cursor) pairs; tickets and users use cursor-based
+        # exports, other resources the time-based export with end_time as the
+        # cursor
+        if resource in ("tickets", "users"):
+            _url = f"{self.base_url}/incremental/{resource}/cursor.json"
+            params = {"per_page": per_page}
+            if cursor is None:
+                params.update({"start_time": start_time})
+            else:
+                params.update({"cursor": cursor})
+            end_of_stream = False
+            while not end_of_stream:
+                data = self._get(_url, params)
+                end_of_stream = data.get("end_of_stream", True)
+                cursor = data.get("after_cursor")
+                yield data, cursor
+                if cursor is None:
+                    break
+                params = {"per_page": per_page, "cursor": cursor}
+        else:
+            _url = f"{self.base_url}/incremental/{resource}.json"
+            if cursor is not None:
+                start_time = int(cursor)
+            params = {"per_page": per_page, "start_time": start_time}
+            while _url is not None:
+                data = self._get(_url, params)
+                yield data, str(data.get("end_time"))
+                if data.get("end_of_stream", True):
+                    break
+                _url = data.get("next_page")
+                params = None
+
+    def get_incremental_tickets(
+        self,
+        start_time: int = 0,
+        checkpoint: pathlib.Path = None,
+        per_page: int = 1000,
+    ):
+        # the cursor is written to the checkpoint file after each page has
+        # been consumed, so a restarted export resumes from the last full page
         _url = f"{self.base_url}/incremental/tickets/cursor.json"
-        params = {"start_time": start_time}
-        data = self._get(_url, params)
-        yield from [ZendeskTicket(self, t) for t in data.get("tickets", [])]
+        params = {"per_page": per_page}
+        if checkpoint is not None and checkpoint.exists():
+            log.info(f"Resuming incremental ticket export from {checkpoint}")
+            params.update({"cursor": checkpoint.read_text().strip()})
+        else:
+            params.update({"start_time": start_time})
+        end_of_stream = False
+        while not end_of_stream:
+            data = yield from self._get_stream(_url, params, "tickets", ZendeskTicket)
+            end_of_stream = data.get("end_of_stream", True)
+            cursor = data.get("after_cursor")
+            if cursor is None:
+                break
+            if checkpoint is not None:
+                _write_checkpoint(checkpoint, cursor)
+            params = {"per_page": per_page, "cursor": cursor}
+
+    def get_job_status(self, job_id: str) -> "ZendeskJobStatus":
+        _url = f"{self.base_url}/job_statuses/{job_id}.json"
+        data = self._get(_url)
+        return ZendeskJobStatus(self, data.get("job_status"))
+
+    def get_job_statuses(self, job_ids: list[str]) -> list["ZendeskJobStatus"]:
+        _url = f"{self.base_url}/job_statuses/show_many.json"
+        result = []
+        for batch in _batches(job_ids, 100):
+            data = self._get(_url, {"ids": ",".join(batch)})
+            result.extend(ZendeskJobStatus(self, j) for j in data.get("job_statuses"))
+        return result
 
     def get_organization_by_id(
         self, organization_id: int
     ) -> Optional["ZendeskOrganization"]:
-        for org in self.organizations:
-            if org.id == organization_id:
-                return org
-        return None
+        return self.organizations_by_id.get(organization_id)
 
     def get_organization_by_name(
         self, organization_name: str
     ) -> Optional["ZendeskOrganization"]:
-        for org in self.organizations:
-            if org.name == organization_name:
-                return org
-        return None
+        if organization_name is None:
+            return None
+        return self.organizations_by_name.get(organization_name.casefold())
 
-    def get_ticket_comments(self, ticket: "ZendeskTicket"):
+    def get_ticket_comments(self, ticket: "ZendeskTicket", limit: int = None):
+        # with a limit, only the first page of that size is requested
         _url = f"{self.base_url}/tickets/{ticket.id}/comments.json"
-        return [
-            ZendeskTicketComment(ticket, c) for c in self._get(_url).get("comments", [])
-        ]
+        params = {
+            "page[size]": 100 if limit is None else min(limit, 100),
+        }
+        result = []
+        has_more = True
+        while has_more:
+            data = self._get(_url, params)
+            _comments = data.get("comments", [])
+            result.extend([ZendeskTicketComment(ticket, c) for c in _comments])
+            if limit is not None and len(result) >= limit:
+                return result[:limit]
+            has_more = data.get("meta").get("has_more")
+            params.update(
+                {
+                    "page[after]": data.get("meta").get("after_cursor"),
+                }
+            )
+        return result
 
     def get_ticket_field_options(self, field_id: int):
         _url = f"{self.base_url}/ticket_fields/{field_id}/options.json"
@@ -105,74 +755,181 @@ class ZendeskClient:
             yield from [ZendeskCustomFieldOption(self, o) for o in _options]
 
     def get_user_by_id(self, user_id: int) -> Optional["ZendeskUser"]:
-        for user in self.users:
-            if user.id == user_id:
-                return user
-        return None
+        if self._users is not None:
+            return self.users_by_id.get(user_id)
+        return self.get_users_by_ids([user_id]).get(user_id)
+
+    def get_users_by_ids(self, user_ids: Iterable[int]) -> dict[int, "ZendeskUser"]:
+        # served from the full user list when it is loaded; otherwise from the
+        # user cache, with the misses fetched through show_many 100 at a time
+        user_ids = list(dict.fromkeys(user_ids))
+        if self._users is not None:
+            by_id = self.users_by_id
+            return {i: by_id.get(i) for i in user_ids if i in by_id}
+        result = {}
+        missing = []
+        with self._user_cache_lock:
+            for user_id in user_ids:
+                user = self._user_cache.get(user_id)
+                if user is None:
+                    missing.append(user_id)
+                else:
+                    self._user_cache.move_to_end(user_id)
+                    result[user_id] = user
+        _url = f"{self.base_url}/users/show_many.json"
+        for batch in _batches(missing, 100):
+            log.debug(f"Fetching {len(batch)} users by id")
+            data = self._get(_url, {"ids": ",".join(str(i) for i in batch)})
+            users = [self.record(ZendeskUser, u) for u in data.get("users", [])]
+            with self._user_cache_lock:
+                for user in users:
+                    self._user_cache[user.id] = user
+                    self._user_cache.move_to_end(user.id)
+                while len(self._user_cache) > self.user_cache_size:
+                    self._user_cache.popitem(last=False)
+            result.update((user.id, user) for user in users)
+        return {i: result.get(i) for i in user_ids if i in result}
 
     @property
     def group_memberships(self) -> list["ZendeskGroupMembership"]:
         if self._group_memberships is None:
-            result = []
-            url = f"{self.base_url}/group_memberships.json"
-            params = {
-                "page[size]": 100,
-            }
-            has_more = True
-            while has_more:
-                data = self._get(url, params)
-                _memberships = data.get("group_memberships")
-                result.extend([ZendeskGroupMembership(self, i) for i in _memberships])
-                has_more = data.get("meta").get("has_more")
-                params.update(
-                    {
-                        "page[after]": data.get("meta").get("after_cursor"),
-                    }
-                )
-            self._group_memberships = result
+            self._group_memberships = list(self.iter_group_memberships())
         return self._group_memberships
 
     @property
     def groups(self) -> list["ZendeskGroup"]:
         if self._groups is None:
-            result = []
-            url = f"{self.base_url}/groups.json"
-            params = {
-                "page[size]": 100,
-            }
-            has_more = True
-            while has_more:
-                data = self._get(url, params)
-                _groups = data.get("groups")
-                result.extend([ZendeskGroup(self, i) for i in _groups])
-                has_more = data.get("meta").get("has_more")
-                params.update(
-                    {
-                        "page[after]": data.get("meta").get("after_cursor"),
-                    }
-                )
-            self._groups = result
+            self._groups = list(self.iter_groups())
         return self._groups
 
-    def list_group_memberships_for_user(self, user_id: int):
+    @property
+    def groups_by_id(self) -> dict[int, "ZendeskGroup"]:
+        if self._groups_by_id is None:
+            self._groups_by_id = {g.id: g for g in self.groups}
+        return self._groups_by_id
+
+    @property
+    def groups_by_name(self) -> dict[str, "ZendeskGroup"]:
+        if self._groups_by_name is None:
+            self._groups_by_name = _index_by_name(self.groups)
+        return self._groups_by_name
+
+    def _index_group_memberships(self):
+        by_group = {}
+        by_user = {}
         for m in self.group_memberships:
-            if m.user_id == user_id:
-                yield m
+            by_group.setdefault(m.group_id, []).append(m)
+            by_user.setdefault(m.user_id, []).append(m)
+        self._group_memberships_by_group = by_group
+        self._group_memberships_by_user = by_user
+
+    def _index_organization_memberships(self):
+        by_org = {}
+        by_user = {}
+        for m in self.organization_memberships:
+            by_org.setdefault(m.organization_id, []).append(m)
+            by_user.setdefault(m.user_id, []).append(m)
+        self._organization_memberships_by_org = by_org
+        self._organization_memberships_by_user = by_user
+
+    def iter_group_memberships(self):
+        yield from self._iter_collection("group_memberships", ZendeskGroupMembership)
+
+    def iter_groups(self):
+        yield from self._iter_collection("groups", ZendeskGroup)
+
+    def iter_organization_memberships(self):
+        yield from self._iter_collection(
+            "organization_memberships", ZendeskOrganizationMembership
+        )
+
+    def iter_organizations(self):
+        yield from self._iter_collection("organizations", ZendeskOrganization)
+
+    def iter_ticket_comments(
+        self, tickets: Iterable["ZendeskTicket"], limit: int = None, workers: int = 8
+    ):
+        # yields (ticket, comments) in the order of tickets, keeping up to
+        # twice as many requests queued as there are workers; requests still
+        # go through the shared rate limiter
+        with concurrent.futures.ThreadPoolExecutor(workers) as executor:
+            pending = collections.deque()
+            for ticket in tickets:
+                future = executor.submit(self.get_ticket_comments, ticket, limit)
+                pending.append((ticket, future))
+                if len(pending) >= workers * 2:
+                    ticket, future = pending.popleft()
+                    yield ticket, future.result()
+            while pending:
+                ticket, future = pending.popleft()
+                yield ticket, future.result()
+
+    def iter_users(self):
+        yield from self._iter_collection("users", ZendeskUser)
+
+    def list_group_memberships_for_user(self, user_id: int):
+        if self._group_memberships_by_user is None:
+            self._index_group_memberships()
+        yield from self._group_memberships_by_user.get(user_id, [])
 
     def list_memberships_for_group(self, group_id: int):
-        for m in self.group_memberships:
-            if m.group_id == group_id:
-                yield m
+        if self._group_memberships_by_group is None:
+            self._index_group_memberships()
+        yield from self._group_memberships_by_group.get(group_id, [])
 
     def list_memberships_for_org(self, organization_id: int):
-        for m in self.organization_memberships:
-            if m.organization_id == organization_id:
-                yield m
+        if self._organization_memberships_by_org is None:
+            self._index_organization_memberships()
+        yield from self._organization_memberships_by_org.get(organization_id, [])
 
     def list_org_memberships_for_user(self, user_id: int):
-        for m in self.organization_memberships:
-            if m.user_id == user_id:
-                yield m
+        if self._organization_memberships_by_user is None:
+            self._index_organization_memberships()
+        yield from self._organization_memberships_by_user.get(user_id, [])
+
+    def list_users(self, include: tuple[str, ...] = ("identities",)):
+        # sideloaded records are attached to each user so that emails,
+        # organizations and groups do not need a request of their own
+        url = f"{self.base_url}/users.json"
+        params = {
+            "page[size]": 100,
+        }
+        if include:
+            params.update({"include": ",".join(include)})
+        has_more = True
+        while has_more:
+            data = self._get(url, params)
+            identities = {}
+            for i in data.get("identities", []):
+                identities.setdefault(i.get("user_id"), []).append(
+                    self.record(ZendeskUserIdentity, i)
+                )
+            orgs = {
+                o.get("id"): self.record(ZendeskOrganization, o)
+                for o in data.get("organizations", [])
+            }
+            groups = {
+                g.get("id"): self.record(ZendeskGroup, g)
+                for g in data.get("groups", [])
+            }
+            for u in data.get("users"):
+                user = self.record(ZendeskUser, u)
+                if "identities" in include:
+                    user._identities = identities.get(user.id, [])
+                if "organizations" in include and "organization_ids" in u:
+                    org_ids = u.get("organization_ids")
+                    user._organizations = [orgs[o] for o in org_ids if o in orgs]
+                if "groups" in include and "group_ids" in u:
+                    user._groups = [
+                        groups[g] for g in u.get("group_ids") if g in groups
+                    ]
+                yield user
+            has_more = data.get("meta").get("has_more")
+            params.update(
+                {
+                    "page[after]": data.get("meta").get("after_cursor"),
+                }
+            )
 
     def list_user_identities(self, user_id: int):
         _url = f"{self.base_url}/users/{user_id}/identities.json"
@@ -185,50 +942,41 @@ class ZendeskClient:
     @property
     def organization_memberships(self):
         if self._organization_memberships is None:
-            result = []
-            url = f"{self.base_url}/organization_memberships.json"
-            params = {
-                "page[size]": 100,
-            }
-            has_more = True
-            while has_more:
-                data = self._get(url, params)
-                _memberships = data.get("organization_memberships")
-                result.extend(
-                    [ZendeskOrganizationMembership(self, i) for i in _memberships]
-                )
-                has_more = data.get("meta").get("has_more")
-                params.update(
-                    {
-                        "page[after]": data.get("meta").get("after_cursor"),
-                    }
-                )
-            self._organization_memberships = result
+            self._organization_memberships = list(self.iter_organization_memberships())
         return self._organization_memberships
 
     @property
     def organizations(self):
         if self._organizations is None:
             log.debug("Fetching organization list for this client")
-            result = []
-            url = f"{self.base_url}/organizations.json"
-            params = {
-                "page[size]": 100,
-            }
-            has_more = True
-            while has_more:
-                data = self._get(url, params)
-                orgs = data.get("organizations")
-                result.extend([ZendeskOrganization(self, o) for o in orgs])
-                has_more = data.get("meta").get("has_more")
-                params.update(
-                    {
-                        "page[after]": data.get("meta").get("after_cursor"),
-                    }
-                )
-            self._organizations = result
+            self._organizations = list(self.iter_organizations())
         return self._organizations
 
+    @property
+    def organizations_by_id(self) -> dict[int, "ZendeskOrganization"]:
+        if self._organizations_by_id is None:
+            self._organizations_by_id = {o.id: o for o in self.organizations}
+        return self._organizations_by_id
+
+    @property
+    def organizations_by_name(self) -> dict[str, "ZendeskOrganization"]:
+        if self._organizations_by_name is None:
+            self._organizations_by_name = _index_by_name(self.organizations)
+        return self._organizations_by_name
+
+    def record(self, model: type, data: dict) -> "ZendeskApiObject":
+        return self.models.get(model, model)(self, data)
+
+    def reindex_organization(self, org: "ZendeskOrganization", old_name: str):
+        if self._organizations_by_name is None:
+            return
+        if old_name is not None:
+            key = old_name.casefold()
+            if self._organizations_by_name.get(key) is org:
+                del self._organizations_by_name[key]
+        if org.name is not None:
+            self._organizations_by_name.setdefault(org.name.casefold(), org)
+
     def search(
         self,
         query: str,
@@ -246,17 +994,39 @@ class ZendeskClient:
         data = self._get(_url, params)
         return data
 
+    def search_export(self, query: str, filter_type: str, page_size: int = 1000):
+        # search/export.json is cursor paged and not capped at 1000 results;
+        # pages are read whole so that callers that prompt between results do
+        # not hold a response open
+        _url = f"{self.base_url}/search/export.json"
+        params = {
+            "filter[type]": filter_type,
+            "page[size]": page_size,
+            "query": query,
+        }
+        has_more = True
+        while has_more:
+            data = self._get(_url, params)
+            yield from data.get("results", [])
+            has_more = data.get("meta").get("has_more")
+            params.update(
+                {
+                    "page[after]": data.get("meta").get("after_cursor"),
+                }
+            )
+
     def search_tickets(self, query: str, sort_by: str = None, sort_order: str = "desc"):
-        _query = f"type:ticket {query}"
-        page = 0
-        more = True
-        while more:
-            page += 1
-            data = self.search(_query, sort_by, sort_order, page=page)
-            for t in data.get("results"):
-                yield ZendeskTicket(self, t)
-            if data.get("next_page") is None:
-                more = False
+        # the export endpoint does not sort, so sorted searches are collected
+        # and sorted here before they are returned
+        results = self.search_export(query, "ticket")
+        if sort_by is not None:
+            results = sorted(
+                results,
+                key=lambda t: (t.get(sort_by) is not None, t.get(sort_by)),
+                reverse=sort_order == "desc",
+            )
+        for t in results:
+            yield self.record(ZendeskTicket, t)
 
     def search_users(self, query: str):
         _url = f"{self.base_url}/users/search.json"
@@ -264,12 +1034,34 @@ class ZendeskClient:
         data = self._get(_url, params)
         return data
 
+    def sync_organization_memberships(
+        self, desired: dict[int, set[int]]
+    ) -> list["ZendeskJobStatus"]:
+        to_create, to_destroy = self.diff_organization_memberships(desired)
+        log.info(
+            f"Adding {len(to_create)} and removing {len(to_destroy)} "
+            "organization memberships"
+        )
+        jobs = []
+        try:
+            jobs.extend(self.create_organization_memberships_many(to_create))
+            jobs.extend(self.destroy_organization_memberships_many(to_destroy))
+        except ZendeskJobsError as e:
+            raise ZendeskJobsError(e, jobs + e.jobs) from e
+        finally:
+            self._organization_memberships = None
+            self._organization_memberships_by_org = None
+            self._organization_memberships_by_user = None
+        return jobs
+
     @property
-    def ticket_fields(self):
-        _url = f"{self.base_url}/ticket_fields.json"
-        data = self._get(_url)
-        _ticket_fields = data.get("ticket_fields", [])
-        yield from [ZendeskTicketField(self, f) for f in _ticket_fields]
+    def ticket_fields(self) -> list["ZendeskTicketField"]:
+        if self._ticket_fields is None:
+            _url = f"{self.base_url}/ticket_fields.json"
+            data = self._get(_url)
+            _ticket_fields = data.get("ticket_fields", [])
+            self._ticket_fields = [ZendeskTicketField(self, f) for f in _ticket_fields]
+        return self._ticket_fields
 
     @property
     def tickets(self):
@@ -278,7 +1070,7 @@ class ZendeskClient:
             data = self._get(_url)
             _url = data.get("next_page")
             _tickets = data.get("tickets")
-            yield from [ZendeskTicket(self, i) for i in _tickets]
+            yield from [self.record(ZendeskTicket, i) for i in _tickets]
 
     def unassign_organization(self, user_id: int, organization_id: int):
         url = f"{self.base_url}/users/{user_id}/organizations/{organization_id}.json"
@@ -290,40 +1082,441 @@ class ZendeskClient:
         data = self._put(_url, json)
         return data
 
+    def update_organizations_many(
+        self, changes: dict[int, dict]
+    ) -> list["ZendeskJobStatus"]:
+        return self._update_many("organizations", "organization", changes)
+
+    def update_record(
+        self, resource: str, record_id: int, params: dict, record=None
+    ) -> dict | None:
+        # used by the model setters, before they change record; returns None
+        # when the change was added to the open batch instead of being sent
+        if self._batch is not None:
+            self._batch.add(resource, record_id, params, record)
+            return None
+        update = {
+            "organizations": self.update_organization,
+            "tickets": self.update_ticket,
+            "users": self.update_user,
+        }.get(resource)
+        return update(record_id, params)
+
     def update_ticket(self, ticket_id: int, params: dict):
         _url = f"{self.base_url}/tickets/{ticket_id}.json"
         json = {"ticket": params}
         data = self._put(_url, json)
         return data
 
+    def update_tickets_many(self, changes: dict[int, dict]) -> list["ZendeskJobStatus"]:
+        return self._update_many("tickets", "ticket", changes)
+
     def update_user(self, user_id: int, params: dict):
         _url = f"{self.base_url}/users/{user_id}.json"
         json = {"user": params}
         data = self._put(_url, json)
         return data
 
+    def update_users_many(self, changes: dict[int, dict]) -> list["ZendeskJobStatus"]:
+        return self._update_many("users", "user", changes)
+
     @property
     def users(self) -> list["ZendeskUser"]:
         if self._users is None:
-            result = []
-            url = f"{self.base_url}/users.json"
-            params = {
-                "page[size]": 100,
-            }
-            has_more = True
-            while has_more:
-                data = self._get(url, params)
-                _users = data.get("users")
-                result.extend([ZendeskUser(self, u) for u in _users])
-                has_more = data.get("meta").get("has_more")
-                params.update(
-                    {
-                        "page[after]": data.get("meta").get("after_cursor"),
-                    }
-                )
-            self._users = result
+            self._users = list(self.iter_users())
         return self._users
 
+    @property
+    def users_by_id(self) -> dict[int, "ZendeskUser"]:
+        if self._users_by_id is None:
+            self._users_by_id = {u.id: u for u in self.users}
+        return self._users_by_id
+
+    def users_table(
+        self,
+        fields: Iterable[str] = ("id", "name", "email", "role", "organizations"),
+    ) -> table.ColumnTable:
+        # one column per field; organizations, groups and org_tags are the
+        # sorted names or tags of the memberships, joined with |
+        dtypes = {
+            "id": "int64",
+            "active": "bool",
+            "restricted_agent": "bool",
+            "shared": "bool",
+            "suspended": "bool",
+            "verified": "bool",
+            "created_at": "datetime64[s]",
+            "last_login_at": "datetime64[s]",
+            "updated_at": "datetime64[s]",
+        }
+        fields = list(fields)
+        org_names = {o.id: o.name for o in self.organizations}
+        org_tags = {o.id: o.tags for o in self.organizations}
+        group_names = {g.id: g.name for g in self.groups}
+
+        def organizations(user_id: int) -> str:
+            ms = self.list_org_memberships_for_user(user_id)
+            return "|".join(sorted(org_names.get(m.organization_id) or "" for m in ms))
+
+        def groups(user_id: int) -> str:
+            ms = self.list_group_memberships_for_user(user_id)
+            return "|".join(sorted(group_names.get(m.group_id) or "" for m in ms))
+
+        def tags(user_id: int) -> str:
+            result = set()
+            for m in self.list_org_memberships_for_user(user_id):
+                result.update(org_tags.get(m.organization_id, []))
+            return "|".join(sorted(result))
+
+        joins = {"organizations": organizations, "groups": groups, "org_tags": tags}
+        columns = {f: [] for f in fields}
+        for user in self.iter_users():
+            for f in fields:
+                join = joins.get(f)
+                columns[f].append(user.get(f) if join is None else join(user.id))
+        return table.ColumnTable(columns, dtypes)
+
+    def wait_for_jobs(
+        self, jobs: list["ZendeskJobStatus"], interval: float = None
+    ) -> list["ZendeskJobStatus"]:
+        # all pending jobs are polled together through show_many
+        if interval is None:
+            interval = self.job_poll_interval
+        latest = {job.id: job for job in jobs}
+        pending = [job.id for job in jobs if not job.done]
+        while pending:
+            time.sleep(interval)
+            statuses = {j.id: j for j in self.get_job_statuses(pending)}
+            for job_id in pending:
+                if job_id not in statuses:
+                    log.warning(f"Job {job_id} is no longer available")
+            latest.update(statuses)
+            pending = [i for i in pending if i in statuses and not statuses[i].done]
+        done = {job.id for job in latest.values() if job.done}
+        self._jobs_in_flight = [i for i in self._jobs_in_flight if i not in done]
+        for job in latest.values():
+            log.debug(f"Job {job.id} is {job.status}")
+        return [latest[job.id] for job in jobs]
+
+
+class AsyncZendeskClient:
+    collections = (
+        "group_memberships",
+        "groups",
+        "organization_memberships",
+        "organizations",
+        "users",
+    )
+
+    def __init__(
+        self,
+        company: str,
+        username: str,
+        password: str,
+        concurrency: int = 5,
+        **kwargs,
+    ):
+        self.client = ZendeskClient(company, username, password, **kwargs)
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self._loads = {}
+
+    async def _run(self, func, *args):
+        async with self.semaphore:
+            return await asyncio.to_thread(func, *args)
+
+    def _load(self, name: str) -> asyncio.Future:
+        # share one in-flight fetch per collection between concurrent callers
+        if name not in self._loads:
+            log.debug(f"Fetching {name} for this client")
+            func = operator.attrgetter(name)
+            self._loads[name] = asyncio.ensure_future(self._run(func, self.client))
+        return self._loads[name]
+
+    def clear_cache(self):
+        self._loads.clear()
+        self.client.clear_cache()
+
+    async def create_organization_membership(self, user_id: int, organization_id: int):
+        return await self._run(
+            self.client.create_organization_membership, user_id, organization_id
+        )
+
+    async def get_group_by_id(self, group_id: int) -> Optional["ZendeskGroup"]:
+        await self.groups()
+        return self.client.get_group_by_id(group_id)
+
+    async def get_group_by_name(self, group_name: str) -> Optional["ZendeskGroup"]:
+        await self.groups()
+        return self.client.get_group_by_name(group_name)
+
+    async def get_organization_by_id(
+        self, organization_id: int
+    ) -> Optional["ZendeskOrganization"]:
+        await self.organizations()
+        return self.client.get_organization_by_id(organization_id)
+
+    async def get_organization_by_name(
+        self, organization_name: str
+    ) -> Optional["ZendeskOrganization"]:
+        await self.organizations()
+        return self.client.get_organization_by_name(organization_name)
+
+    async def get_ticket_comments(self, ticket: "ZendeskTicket", limit: int = None):
+        return await self._run(self.client.get_ticket_comments, ticket, limit)
+
+    async def get_user_by_id(self, user_id: int) -> Optional["ZendeskUser"]:
+        await self.users()
+        return self.client.get_user_by_id(user_id)
+
+    async def get_users_by_ids(
+        self, user_ids: Iterable[int]
+    ) -> dict[int, "ZendeskUser"]:
+        return await self._run(self.client.get_users_by_ids, list(user_ids))
+
+    async def group_memberships(self) -> list["ZendeskGroupMembership"]:
+        return await self._load("group_memberships")
+
+    async def groups(self) -> list["ZendeskGroup"]:
+        return await self._load("groups")
+
+    async def list_group_memberships_for_user(self, user_id: int):
+        await self.group_memberships()
+        return list(self.client.list_group_memberships_for_user(user_id))
+
+    async def list_memberships_for_group(self, group_id: int):
+        await self.group_memberships()
+        return list(self.client.list_memberships_for_group(group_id))
+
+    async def list_memberships_for_org(self, organization_id: int):
+        await self.organization_memberships()
+        return list(self.client.list_memberships_for_org(organization_id))
+
+    async def list_org_memberships_for_user(self, user_id: int):
+        await self.organization_memberships()
+        return list(self.client.list_org_memberships_for_user(user_id))
+
+    async def list_user_identities(self, user_id: int):
+        return await self._run(lambda: list(self.client.list_user_identities(user_id)))
+
+    async def load(self):
+        await asyncio.gather(*[self._load(name) for name in self.collections])
+
+    async def organization_memberships(self):
+        return await self._load("organization_memberships")
+
+    async def organizations(self):
+        return await self._load("organizations")
+
+    async def search(self, query: str, **kwargs):
+        return await self._run(lambda: self.client.search(query, **kwargs))
+
+    async def unassign_organization(self, user_id: int, organization_id: int):
+        return await self._run(
+            self.client.unassign_organization, user_id, organization_id
+        )
+
+    async def update_organization(self, org_id: int, params: dict):
+        return await self._run(self.client.update_organization, org_id, params)
+
+    async def update_ticket(self, ticket_id: int, params: dict):
+        return await self._run(self.client.update_ticket, ticket_id, params)
+
+    async def update_user(self, user_id: int, params: dict):
+        return await self._run(self.client.update_user, user_id, params)
+
+    async def users(self) -> list["ZendeskUser"]:
+        return await self._load("users")
+
+
+def _batches(items: list, size: int):
+    for i in range(0, len(items), size):
+        yield items[i : i + size]
+
+
+class _JsonStream:
+    # incremental reader over a JSON document arriving in byte chunks; values
+    # are decoded with raw_decode once enough text has been buffered
+    decoder = json.JSONDecoder()
+
+    def __init__(self, chunks: Iterable[bytes]):
+        self.chunks = iter(chunks)
+        self.text_decoder = codecs.getincrementaldecoder("utf-8")()
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self) -> bool:
+        if self.eof:
+            return False
+        if self.pos > 65536:
+            self.buffer = self.buffer[self.pos :]
+            self.pos = 0
+        try:
+            self.buffer += self.text_decoder.decode(next(self.chunks))
+        except StopIteration:
+            self.buffer += self.text_decoder.decode(b"", final=True)
+            self.eof = True
+        return True
+
+    def next_char(self) -> str:
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos].isspace():
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._fill():
+                raise ValueError("Unexpected end of JSON document")
+
+    def expect(self, char: str):
+        if self.next_char() != char:
+            raise ValueError(f"Expected {char!r} at position {self.pos}")
+        self.pos += 1
+
+    def value(self):
+        self.next_char()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+                # a number that reaches the end of the buffer, or stops where
+                # more of a number follows ("1" of "1.5"), may be incomplete
+                incomplete = end == len(self.buffer) or (
+                    isinstance(value, (int, float))
+                    and not isinstance(value, bool)
+                    and self.buffer[end] in "0123456789.eE+-"
+                )
+                if self.eof or not incomplete:
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            self._fill()
+
+
+def _iter_json_array(chunks: Iterable[bytes], key: str):
+    # yield the elements of the top-level array named key one at a time and
+    # return the other top-level members once the document is complete
+    stream = _JsonStream(chunks)
+    rest = {}
+    stream.expect("{")
+    if stream.next_char() == "}":
+        return rest
+    while True:
+        name = stream.value()
+        stream.expect(":")
+        if name == key and stream.next_char() == "[":
+            stream.expect("[")
+            if stream.next_char() == "]":
+                stream.pos += 1
+            else:
+                while True:
+                    yield stream.value()
+                    if stream.next_char() == "]":
+                        stream.pos += 1
+                        break
+                    stream.expect(",")
+        else:
+            rest[name] = stream.value()
+        if stream.next_char() == "}":
+            return rest
+        stream.expect(",")
+
+
+_MISSING = object()
+
+
+class ZendeskRecord:
+    # a dict-like stand-in for ZendeskApiObject that holds only the fields
+    # in its projection, each in its own slot
+    __slots__ = ("client",)
+    fields: tuple[str, ...] = ()
+
+    def __init__(self, client: ZendeskClient, *args, **kwargs):
+        self.client = client
+        data = dict(*args, **kwargs)
+        for name in self.__slots__:
+            if name.startswith("_"):
+                setattr(self, name, None)
+        for f in self.fields:
+            setattr(self, f"f_{f}", data.get(f, _MISSING))
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.fields and getattr(self, f"f_{key}") is not _MISSING
+
+    def __getitem__(self, key: str):
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.keys())
+
+    def __repr__(self):
+        return f"{type(self).__name__}({dict(self)})"
+
+    def get(self, key: str, default=None):
+        if key not in self.fields:
+            raise KeyError(f"{key} is not in the field projection")
+        value = getattr(self, f"f_{key}")
+        if value is _MISSING:
+            return default
+        return value
+
+    def items(self) -> list[tuple[str, object]]:
+        return [(f, getattr(self, f"f_{f}")) for f in self.keys()]
+
+    def keys(self) -> list[str]:
+        return [f for f in self.fields if f in self]
+
+    def update(self, *args, **kwargs):
+        for key, value in dict(*args, **kwargs).items():
+            if key in self.fields:
+                setattr(self, f"f_{key}", value)
+
+    def values(self) -> list:
+        return [getattr(self, f"f_{f}") for f in self.keys()]
+
+
+@functools.cache
+def compact_model(model: type, fields: tuple[str, ...]) -> type:
+    # copy the properties and methods of model onto a ZendeskRecord subclass;
+    # class attributes that models use as per-instance caches become slots
+    if "id" not in fields:
+        fields = ("id",) + fields
+    namespace = {"fields": fields}
+    caches = []
+    for klass in reversed(model.__mro__):
+        if klass in (dict, object):
+            continue
+        for name, value in vars(klass).items():
+            if name.startswith("__") and name != "__str__":
+                continue
+            if name.startswith("_") and value is None:
+                caches.append(name)
+            elif isinstance(value, property) or callable(value):
+                namespace[name] = value
+    namespace["__slots__"] = tuple(f"f_{f}" for f in fields) + tuple(caches)
+    return type(f"Compact{model.__name__}", (ZendeskRecord,), namespace)
+
+
+def _write_checkpoint(checkpoint: pathlib.Path, cursor: str):
+    tmp = checkpoint.with_name(f"{checkpoint.name}.tmp")
+    tmp.write_text(cursor)
+    tmp.replace(checkpoint)
+
+
+def _index_by_name(objects: list["ZendeskApiObject"]) -> dict:
+    # keep the first match, like the linear scans these indexes replaced
+    result = {}
+    for o in objects:
+        if o.name is not None:
+            result.setdefault(o.name.casefold(), o)
+    return result
+
 
 class ZendeskApiObject(dict):
     def __init__(self, client: ZendeskClient, *args, **kwargs):
@@ -385,6 +1578,32 @@ class ZendeskGroupMembership(ZendeskApiObject):
         return self.get("user_id")
 
 
+class ZendeskJobStatus(ZendeskApiObject):
+    @property
+    def done(self) -> bool:
+        return self.status in ("completed", "failed", "killed")
+
+    @property
+    def failures(self) -> list[dict]:
+        return [r for r in self.results if not r.get("success", "error" not in r)]
+
+    @property
+    def progress(self) -> int:
+        return self.get("progress")
+
+    @property
+    def results(self) -> list[dict]:
+        return self.get("results") or []
+
+    @property
+    def status(self) -> str:
+        return self.get("status")
+
+    @property
+    def total(self) -> int:
+        return self.get("total")
+
+
 class ZendeskOrganization(ZendeskApiObject):
     _memberships = None
 
@@ -403,9 +1622,11 @@ class ZendeskOrganization(ZendeskApiObject):
 
     @name.setter
     def name(self, value: str):
+        old_name = self.name
         params = dict(name=value)
+        self.client.update_record("organizations", self.id, params, self)
         self.update(params)
-        self.client.update_organization(self.id, params)
+        self.client.reindex_organization(self, old_name)
 
     @property
     def tags(self) -> list[str]:
@@ -413,7 +1634,8 @@ class ZendeskOrganization(ZendeskApiObject):
 
     @property
     def users(self) -> list["ZendeskUser"]:
-        return [self.client.get_user_by_id(m.user_id) for m in self.memberships]
+        users = self.client.get_users_by_ids(m.user_id for m in self.memberships)
+        return [users.get(m.user_id) for m in self.memberships]
 
 
 class ZendeskOrganizationMembership(ZendeskApiObject):
@@ -450,8 +1672,8 @@ class ZendeskTicket(ZendeskApiObject):
     @external_id.setter
     def external_id(self, value: str):
         params = dict(external_id=value)
+        self.client.update_record("tickets", self.id, params, self)
         self.update(params)
-        self.client.update_ticket(self.id, params)
 
     @property
     def subject(self) -> str:
@@ -498,6 +1720,7 @@ class ZendeskTicketField(ZendeskCustomField):
 
 class ZendeskUser(ZendeskApiObject):
     _groups = None
+    _identities = None
     _organizations = None
 
     def __str__(self):
@@ -524,12 +1747,16 @@ class ZendeskUser(ZendeskApiObject):
 
     @external_id.setter
     def external_id(self, value: str):
-        response = self.client.update_user(self.id, {"external_id": value})
-        self.update(response.get("user"))
+        params = {"external_id": value}
+        response = self.client.update_record("users", self.id, params, self)
+        self.update(params if response is None else response.get("user"))
 
     @property
     def identities(self):
-        yield from self.client.list_user_identities(self.id)
+        if self._identities is None:
+            yield from self.client.list_user_identities(self.id)
+        else:
+            yield from self._identities
 
     @property
     def last_login_at(self):
@@ -587,8 +1814,9 @@ class ZendeskUser(ZendeskApiObject):
     @ticket_restriction.setter
     def ticket_restriction(self, value: str):
         if value in ("assigned", "groups", "organization", "requested", None):
-            response = self.client.update_user(self.id, {"ticket_restriction": value})
-            self.update(response.get("user"))
+            params = {"ticket_restriction": value}
+            response = self.client.update_record("users", self.id, params, self)
+            self.update(params if response is None else response.get("user"))
 
     def unassign_organization(self, org: ZendeskOrganization):
         self.client.unassign_organization(self.id, org.id)